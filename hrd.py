@@ -1,7 +1,24 @@
-from copy import deepcopy
-from heapq import heappush, heappop
+from heapq import heappush, heappop, heapify, merge as heapq_merge
+from bisect import bisect_left
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations, islice
+from queue import Empty
+import csv
+import json
+import multiprocessing
+import multiprocessing.util
+import mmap
+import os
+import random
+import signal
+import sqlite3
+import struct
 import time
+from time import perf_counter
 import argparse
+import asyncio
 import sys
 
 #fixed the f f value after heapop implemented
@@ -57,16 +74,26 @@ class Board:
 
         self.pieces = pieces
 
-        # self.grid is a 2-d (size * size) array automatically generated
-        # using the information on the pieces when a board is being created.
+        # self.grid is a 2-d (size * size) array generated on first access
+        # using the information on the pieces. The search itself only works
+        # on the packed integer encoding, so most boards never build it.
         # A grid contains the symbol for representing the pieces on the board.
-        self.grid = []
-        self.__construct_grid()
+        self._grid = None
 
+    @property
+    def grid(self):
+        if self._grid is None:
+            self._grid = []
+            self.__construct_grid()
+        return self._grid
+
+    @grid.setter
+    def grid(self, grid):
+        self._grid = grid
 
     def __construct_grid(self):
         """
-        Called in __init__ to set up a 2-d grid based on the piece location information.
+        Called on first access of self.grid to set up a 2-d grid based on the piece location information.
 
         """
 
@@ -105,29 +132,39 @@ class Board:
 
 class State:
     """
-    State class wrapping a Board with some extra current state information.
+    State class wrapping a packed board id with some extra current state information.
     Note that State and Board are different. Board has the locations of the pieces. 
-    State has a Board and some extra information that is relevant to the search: 
-    heuristic function, f value, current depth and parent.
+    State only keeps the packed encoding of the board (see encode_pieces) and some
+    extra information that is relevant to the search: f value, current depth, parent
+    and where the two empty cells are.
+    The Board is rebuilt from the id on demand, which is only done for output.
     """
 
-    def __init__(self, board, f, depth, parent=None):
+    __slots__ = ('id', 'f', 'depth', 'parent', 'empty_pair')
+
+    def __init__(self, id, f, depth, parent=None, empty_pair=None):
         """
-        :param board: The board of the state.
-        :type board: Board
+        :param id: The packed encoding of the board of the state.
+        :type id: int
         :param f: The f value of current state. //for A*
         :type f: int
         :param depth: The depth of current state in the search tree.
         :type depth: int
         :param parent: The parent of current state.
         :type parent: Optional[State]
+        :param empty_pair: Where the two empty cells are, as indexed in move_table.
+            Worked out from the id when not given.
+        :type empty_pair: Optional[int]
         """
-        self.board = board
+        self.id = id
         self.f = f
         self.depth = depth
         self.parent = parent
-        #self.id = hash(board)  # The id for breaking ties.
-        self.id = hash_board_config(board)  # Glen 's modifed self.id, original code right above
+        self.empty_pair = empty_pair_of(id) if empty_pair is None else empty_pair
+
+    @property
+    def board(self):
+        return board_from_key(self.id)
 
     #def __eq__(self, other):
     #    return self.f == other.f
@@ -136,6 +173,102 @@ class State:
         return self.f < other.f
 
 
+def state_chain(path):
+    # the State chain for a list of packed ids, one move apart, as write_to_text expects
+    curr = None
+    for depth, key in enumerate(path):
+        curr = State(key, depth, depth, curr)
+    return curr
+
+
+class SearchStats:
+    """
+    Counters a search fills in while it runs, for reporting.
+
+    Not every search fills in every counter; dfs and astar fill in all of them. The
+    times are in seconds, and move generation time includes the heuristic of each child.
+    """
+
+    def __init__(self):
+        self.generated = 0
+        self.expanded = 0
+        self.duplicates = 0
+        self.peak_frontier = 0
+        self.peak_closed = 0
+        self.depth = None
+        self.seconds = 0.0
+        self.movegen_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.heap_seconds = 0.0
+        self.node_bytes = 0
+        self.closed_bytes = 0.0
+        self.cache_hit = None
+        # how many times longer than the shortest the solution can be; 1 when it is the shortest
+        self.bound = None
+        # the solutions an anytime search went through, with when and how good each was
+        self.solutions = []
+        # the engine whose answer a portfolio returned
+        self.winner = None
+        self.cache_hit_rate = None
+
+    @property
+    def branching_factor(self):
+        # the average number of children of an expanded board
+        return self.generated / self.expanded if self.expanded else 0.0
+
+    def as_dict(self):
+        counters = dict(vars(self))
+        counters['branching_factor'] = self.branching_factor
+        return counters
+
+
+class NodeStore:
+    """
+    The nodes of a search in parallel typed arrays, about 18 bytes a node. A node is
+    referred to by its index and holds the packed id of its board, the index of its parent
+    (-1 for the root), its depth g and the empty pair of its board. The move that produced
+    a node is its id XOR its parent's id, which move_names names.
+    """
+
+    def __init__(self):
+        self.keys = array('Q')
+        self.parents = array('i')
+        self.depths = array('I')
+        self.empty_pairs = array('H')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, parent, depth, empty_pair):
+        self.keys.append(key)
+        self.parents.append(parent)
+        self.depths.append(depth)
+        self.empty_pairs.append(empty_pair)
+        return len(self.keys) - 1
+
+    def bytes_per_node(self):
+        return sum(column.itemsize for column in (self.keys, self.parents, self.depths, self.empty_pairs))
+
+    def state(self, index):
+        """
+        Build the State chain from the root to the given node, for writing the solution.
+
+        :param index: The node the chain ends at.
+        :type index: int
+        :return: The state of that node; its parent chain leads back to the root.
+        :rtype: State
+        """
+        path = []
+        while index >= 0:
+            path.append(index)
+            index = self.parents[index]
+        curr = None
+        for index in reversed(path):
+            depth = self.depths[index]
+            curr = State(self.keys[index], depth, depth, curr, self.empty_pairs[index])
+        return curr
+
+
 def read_from_file(filename):
     """
     Load initial board from a given file.
@@ -147,12 +280,27 @@ def read_from_file(filename):
     """
 
     puzzle_file = open(filename, "r")
+    board = read_board_lines(puzzle_file)
+    puzzle_file.close()
+
+    return board
+
+
+def read_board_lines(lines):
+    """
+    Load a board from the lines of its text.
+
+    :param lines: The rows of the board.
+    :type lines: Iterable[str]
+    :return: A loaded board
+    :rtype: Board
+    """
 
     line_index = 0
     pieces = []
     g_found = False
 
-    for line in puzzle_file:
+    for line in lines:
 
         for x, ch in enumerate(line):
 
@@ -168,24 +316,104 @@ def read_from_file(filename):
                     g_found = True
         line_index += 1
 
-    puzzle_file.close()
-
     board = Board(pieces)
     
     return board
 
 
-#glen's function
+#====================================================================================
+# Packed board encoding.
+# Every one of the 20 cells gets a 3-bit code, cell (y, x) living at bit 3 * (4 * y + x).
+# A whole configuration therefore fits in a 60-bit int, which is what State.id,
+# the goal test and the explored sets work on. Board.grid is only needed for output.
+
+cell_chars = '.12<>^v'
+cell_bits = 3
+cell_mask = 7
+code_of = {ch: code for code, ch in enumerate(cell_chars)}
+
+# goal piece at rows 3-4, columns 1-2 means its bottom row covers cells (4, 1) and (4, 2)
+goal_mask = (cell_mask << (cell_bits * 17)) | (cell_mask << (cell_bits * 18))
+goal_bits = (code_of[char_goal] << (cell_bits * 17)) | (code_of[char_goal] << (cell_bits * 18))
+
+
+def cell_shift(y, x):
+    return cell_bits * (4 * y + x)
+
+def cell_at(key, y, x):
+    return cell_chars[(key >> cell_shift(y, x)) & cell_mask]
+
+def encode_pieces(pieces):
+    key = 0
+    for p in pieces:
+        if p.is_goal:
+            for dy in (0, 1):
+                for dx in (0, 1):
+                    key |= code_of[char_goal] << cell_shift(p.coord_y + dy, p.coord_x + dx)
+        elif p.is_single:
+            key |= code_of[char_single] << cell_shift(p.coord_y, p.coord_x)
+        elif p.orientation == 'h':
+            key |= code_of['<'] << cell_shift(p.coord_y, p.coord_x)
+            key |= code_of['>'] << cell_shift(p.coord_y, p.coord_x + 1)
+        elif p.orientation == 'v':
+            key |= code_of['^'] << cell_shift(p.coord_y, p.coord_x)
+            key |= code_of['v'] << cell_shift(p.coord_y + 1, p.coord_x)
+    return key
+
+def decode_pieces(key):
+    pieces = []
+    g_found = False
+    for y in range(5):
+        for x in range(4):
+            ch = cell_at(key, y, x)
+            if ch == '^':
+                pieces.append(Piece(False, False, x, y, 'v'))
+            elif ch == '<':
+                pieces.append(Piece(False, False, x, y, 'h'))
+            elif ch == char_single:
+                pieces.append(Piece(False, True, x, y, None))
+            elif ch == char_goal and not g_found:
+                pieces.append(Piece(True, False, x, y, None))
+                g_found = True
+    return pieces
+
+def board_from_key(key):
+    return Board(decode_pieces(key))
+
 def hash_board_config(board):
-    #print('during hash_board_config, the board is:' )
-    #board.display()
-    s = str(board.grid)
-    #board_hash_id = hash(s)
-    board_hash_id = s
-    #print('during hash_board_config, board_hash_id: ', board_hash_id)
-    #if board_hash_id == board_hash_id:
-        #print('Red Flagged!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!! ')
-    return board_hash_id
+    return encode_pieces(board.pieces)
+
+
+# Mirroring the board left to right keeps the goal area (columns 1-2) and the move rules,
+# so a board and its mirror image need the same number of moves to solve.
+# mirror_row[bits] is a packed 4-cell row read right to left, with '<' and '>' swapped.
+row_bits = 4 * cell_bits
+row_mask = (1 << row_bits) - 1
+
+def build_mirror_row():
+    mirrored_char = {'<': '>', '>': '<'}
+    table = []
+    for bits in range(1 << row_bits):
+        row = 0
+        for x in range(4):
+            code = (bits >> (cell_bits * x)) & cell_mask
+            if code >= len(cell_chars):
+                break
+            ch = mirrored_char.get(cell_chars[code], cell_chars[code])
+            row |= code_of[ch] << (cell_bits * (3 - x))
+        table.append(row)
+    return table
+
+mirror_row = build_mirror_row()
+
+def mirror_key(key):
+    mirrored = 0
+    for y in range(5):
+        mirrored |= mirror_row[(key >> (row_bits * y)) & row_mask] << (row_bits * y)
+    return mirrored
+
+def canonical_key(key):
+    return min(key, mirror_key(key))
 
 
 def is_explored(curr, explored):
@@ -208,270 +436,310 @@ def is_id_explored(curr_id, explored_ids):
 
 #need helper function to check if this board config is the same as goal board config, deep board compare
 def is_at_goal(curr):
-    if curr.board.grid[4][1] == '1' and curr.board.grid[4][2] == '1':
-        return True
-    else:
-        return False 
-
-
-
-def create_a_successor(curr, empty_y, empty_x, piece_y, piece_x, d, shape ):
-    #successor = deepcopy(curr)
-    #some improvement I should try to improve speed, deepcopy the pieces instead of the board
-    #deepcopied_board = deepcopy(curr.board)
-    deepcopied_pieces = deepcopy(curr.board.pieces)
-    new_identical_board = Board(deepcopied_pieces)
-    successor = State( new_identical_board, 0, 0, curr)
-    #successor = State( deepcopied_board, 0, 0, curr)
-    #both pieces and grid are needed to be edited, but grid can be edited by calling _contruct_grid
-    #edit the pieces
-    for p in successor.board.pieces:
-        if (d=='up' or d=='down' or d=='left' or d=='right') and shape=='2' and p.is_single==True and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='up' and shape=='v'and p.orientation=='v' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y - 1
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='down' and shape=='v' and p.orientation=='v' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='left' and shape=='h' and p.orientation=='h' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x - 1
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='right' and shape=='h' and p.orientation=='h' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif (d=='left' or d=='right') and shape=='v' and p.orientation=='v' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='left' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x: #8
-            p.coord_y = empty_y
-            p.coord_x = empty_x-1
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='right' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-            #successor.id = hash_board_config(successor.board)
-            #successor.parent = curr
-        elif (d=='up' or d=='down') and shape=='h' and p.orientation=='h' and p.coord_y==piece_y and p.coord_x==piece_x: #11 and #14
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='up' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x: #12
-            p.coord_y = empty_y-1
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-        elif d=='down' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x: #13
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-            #successor.parent = curr
-            #successor.id = hash_board_config(successor.board)
-    #successor.parent = curr   
-    successor.board.grid = []
-    successor.board._Board__construct_grid()
-    #successor.board.display()
-    successor.id = hash_board_config(successor.board) 
-    #debuging below:
-    #successor.board.display()
-    '''
-    if successor.board.grid == [['.','.','<','>'],['1','1','^','2'],['^','1','v','2'],['v','^','2','2'],['.','v','<','>']]:
-        print('Red Flagged!!!!!!!!!!!!!!!!!!!!!  current d is: ', d, 'current shape is:', shape)
-    if successor.board.grid == [['<','>','^','2'],['1','1','v','2'],['1','1','.','2'],['^','^','.','2'],['v','v','<','>']]:
-        print('Red Flagged!!!!!!!!!!!!!!!!!!!!!  current d is: ', d, 'current shape is:', shape)
-    print(' ~ ')
-    '''
-    return successor
+    return (curr.id & goal_mask) == goal_bits
+
+
+
+# cells covered by each piece shape, relative to its top left corner
+piece_cells = {
+    '1': ((0, 0, '1'), (0, 1, '1'), (1, 0, '1'), (1, 1, '1')),
+    '2': ((0, 0, '2'),),
+    'h': ((0, 0, '<'), (0, 1, '>')),
+    'v': ((0, 0, '^'), (1, 0, 'v')),
+}
+move_offsets = {'up': (-1, 0), 'down': (1, 0), 'left': (0, -1), 'right': (0, 1)}
+opposite = {'up': 'down', 'down': 'up', 'left': 'right', 'right': 'left'}
+
+def piece_bits(shape, y, x):
+    bits = 0
+    for dy, dx, ch in piece_cells[shape]:
+        bits |= code_of[ch] << cell_shift(y + dy, x + dx)
+    return bits
+
+def piece_fits(shape, y, x):
+    return all(0 <= y + dy < 5 and 0 <= x + dx < 4 for dy, dx, ch in piece_cells[shape])
+
+# A move only touches the cells of the moved piece, so the child id is the parent id
+# xor'ed with the piece drawn at its old and at its new place.
+# move_deltas[(shape, y, x, d)] is that xor mask for the piece with top left corner (y, x).
+move_deltas = {}
+for shape in piece_cells:
+    for y in range(5):
+        for x in range(4):
+            for d, (dy, dx) in move_offsets.items():
+                if piece_fits(shape, y, x) and piece_fits(shape, y + dy, x + dx):
+                    move_deltas[(shape, y, x, d)] = piece_bits(shape, y, x) ^ piece_bits(shape, y + dy, x + dx)
+
+
+# A 4x5 board always has exactly two empty cells, so the legal moves of a state only
+# depend on where those two are and on what sits next to them.
+# move_table[empty_pair] lists, for the empty cells a < b (empty_pair = 20 * a + b),
+# every move that could slide a piece into them as (mask, bits, delta, new_empty_pair):
+# the move is legal when id & mask == bits, i.e. the piece really covers those cells.
+# The order matches the old grid scan: each empty cell in row-major order looking
+# up/down/left/right, then the 2-wide pieces that need both empty cells.
+# move_names[(empty_pair, delta)] tells which piece a move moved and where to,
+# as (y, x, direction) with (y, x) the top left corner of the piece before the move.
+def piece_cell_set(shape, y, x):
+    return {(y + dy) * 4 + (x + dx) for dy, dx, ch in piece_cells[shape]}
+
+def build_move_table(names):
+    table = [()] * 400
+    for a in range(20):
+        for b in range(a + 1, 20):
+            candidates = []
+            for e in (a, b):
+                y, x = divmod(e, 4)
+                # d is the side of the empty square the piece sits on, the piece moves the opposite way
+                candidates += [('2', y - 1, x, 'up'), ('v', y - 2, x, 'up'),
+                               ('2', y + 1, x, 'down'), ('v', y + 1, x, 'down'),
+                               ('2', y, x - 1, 'left'), ('h', y, x - 2, 'left'),
+                               ('2', y, x + 1, 'right'), ('h', y, x + 1, 'right')]
+            y, x = divmod(a, 4)
+            if b == a + 4: # vertical empty column
+                candidates += [('v', y, x - 1, 'left'), ('1', y, x - 2, 'left'),
+                               ('v', y, x + 1, 'right'), ('1', y, x + 1, 'right')]
+            if b == a + 1 and x < 3: # horizontal empty row
+                candidates += [('h', y - 1, x, 'up'), ('1', y - 2, x, 'up'),
+                               ('h', y + 1, x, 'down'), ('1', y + 1, x, 'down')]
+            moves = []
+            for shape, py, px, d in candidates:
+                dy, dx = move_offsets[opposite[d]]
+                if (shape, py, px, opposite[d]) not in move_deltas:
+                    continue
+                old_cells = piece_cell_set(shape, py, px)
+                new_cells = piece_cell_set(shape, py + dy, px + dx)
+                if old_cells & {a, b} or not new_cells <= old_cells | {a, b}:
+                    continue
+                empties = sorted(({a, b} | old_cells) - new_cells)
+                mask = sum(cell_mask << (cell_bits * c) for c in old_cells)
+                moves.append((mask, piece_bits(shape, py, px), move_deltas[(shape, py, px, opposite[d])],
+                              20 * empties[0] + empties[1]))
+                names[(20 * a + b, moves[-1][2])] = (py, px, opposite[d])
+            table[20 * a + b] = tuple(moves)
+    return table
+
+move_names = {}
+move_table = build_move_table(move_names)
+
+# bit 0 of every cell; used to find the cells holding a given code without a scan
+cell_low_bits = sum(1 << cell_shift(y, x) for y in range(5) for x in range(4))
+
+def empty_pair_of(key):
+    # the empty code is 0, so the empty cells are the ones with none of their three bits set
+    empty = ~(key | key >> 1 | key >> 2) & cell_low_bits
+    low = empty & -empty
+    a = (low.bit_length() - 1) // cell_bits
+    b = ((empty ^ low).bit_length() - 1) // cell_bits
+    return 20 * a + b
+
+
+#-------------------------------------------Below is the closed set----------------------------------------------
+# A python set of ints spends around 90 bytes on each board. KeyTable keeps the packed ids
+# in an open addressed array('Q') instead, 16 to 32 bytes a board depending on how full it
+# is, at the cost of probing in python. BloomFilter goes further for searches that can
+# live with an occasional board wrongly taken as explored: a fixed bit array and a few
+# bits per board, with no ids kept at all.
+
+class KeyTable:
+    """
+    Open addressed hash table of packed ids with linear probing, doubling in size when it
+    is half full. 0 marks an empty slot, which is never the id of a board. With values on,
+    an array('I') beside the ids makes it a map from id to a small int, used for best g.
+    It supports the parts of the set and dict interface the searches use.
+    """
 
+    def __init__(self, values=False):
+        self.bits = 10
+        self.keys = array('Q', bytes(8 << self.bits))
+        self.values = array('I', bytes(4 << self.bits)) if values else None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def slot(self, key):
+        keys = self.keys
+        mask = len(keys) - 1
+        slot = ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.bits)
+        while keys[slot] != key and keys[slot] != 0:
+            slot = (slot + 1) & mask
+        return slot
+
+    def __contains__(self, key):
+        return self.keys[self.slot(key)] == key
+
+    def add(self, key):
+        slot = self.slot(key)
+        if self.keys[slot] == 0:
+            self.keys[slot] = key
+            self.count += 1
+            if 2 * self.count > len(self.keys):
+                self.grow()
+        return slot
+
+    def get(self, key, default=None):
+        slot = self.slot(key)
+        return self.values[slot] if self.keys[slot] == key else default
+
+    def __getitem__(self, key):
+        slot = self.slot(key)
+        if self.keys[slot] != key:
+            raise KeyError(key)
+        return self.values[slot]
+
+    def __setitem__(self, key, value):
+        slot = self.slot(key)
+        self.values[slot] = value
+        if self.keys[slot] == 0:
+            self.keys[slot] = key
+            self.count += 1
+            if 2 * self.count > len(self.keys):
+                self.grow()
+
+    def grow(self):
+        old_keys, old_values = self.keys, self.values
+        self.bits += 1
+        self.keys = array('Q', bytes(8 << self.bits))
+        if old_values is not None:
+            self.values = array('I', bytes(4 << self.bits))
+        for slot, key in enumerate(old_keys):
+            if key:
+                new_slot = self.slot(key)
+                self.keys[new_slot] = key
+                if old_values is not None:
+                    self.values[new_slot] = old_values[slot]
+
+    def bytes_used(self):
+        return self.keys.itemsize * len(self.keys) + (self.values.itemsize * len(self.values) if self.values else 0)
+
+
+class BloomFilter:
+    """
+    A Bloom filter over packed ids: add sets a few bits per id and membership checks
+    them all, so an id that was added is always found, and one that was not is found
+    with a small probability that grows as the filter fills up.
+    """
 
-def add_curr_succ_to_frontier(curr, frontier):
-    #print('Below is the current config:----------------------------------------------')
-    #curr.board.display()
-    #print('child of the current below---------------------------------------------------------------------------------------')
-    direction = ['up', 'down', 'left', 'right']
-    empty_squares = []
-    y_coord = 0
-    #print('add_curr_succ_to_frontier')
-    for y in curr.board.grid: #start with y-axis
-        x_coord = 0
-        #debuging: print("y loop:" + str(y_coord))
-        for x in y: #then x-axis
-            if x == '.':
-                empty_squares.append([y_coord, x_coord]) #will be used for cheking if two . are next to each other
-                for d in direction:
-                    if d == 'up' and (y_coord-1) >= 0 and curr.board.grid[y_coord-1][x_coord] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor(curr, y_coord, x_coord,(y_coord-1),x_coord, 'up', '2' )
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-                    elif d == 'up' and (y_coord-2) >= 0 and curr.board.grid[y_coord-1][x_coord] == 'v': # there can be movemnent for piece 'v'
-                        successor = create_a_successor(curr, y_coord, x_coord,(y_coord-2),x_coord, 'up','v' )
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-                    elif d == 'down' and (y_coord+1) <= 4 and curr.board.grid[y_coord+1][x_coord] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor(curr, y_coord, x_coord,(y_coord+1),x_coord, 'down', '2' ) #this line cuz rasing errors!!!
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-                    elif d == 'down' and (y_coord+2) <= 4 and curr.board.grid[y_coord+1][x_coord] == '^': # there can be movemnent for piece 'v'
-                        successor = create_a_successor(curr, y_coord, x_coord,(y_coord+1),x_coord, 'down','v' )
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-                    elif d == 'left' and (x_coord-1) >= 0 and curr.board.grid[y_coord][x_coord-1] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor(curr, y_coord, x_coord,y_coord, (x_coord-1), 'left', '2' )
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-                    elif d == 'left' and (x_coord-2) >= 0 and curr.board.grid[y_coord][x_coord-1] == '>': # there can be movemnent for piece 'v'
-                        successor = create_a_successor(curr, y_coord, x_coord,(y_coord), (x_coord-2), 'left','h' )
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-                    elif d == 'right' and (x_coord+1) <= 3 and curr.board.grid[y_coord][x_coord+1] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor(curr, y_coord, x_coord,y_coord, (x_coord+1), 'right', '2' )
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-                    elif d == 'right' and (x_coord+2) <= 3 and curr.board.grid[y_coord][x_coord+1] == '<': # there can be movemnent for piece 'v'
-                        successor = create_a_successor(curr, y_coord, x_coord,y_coord, (x_coord+1), 'right','h' )
-                        frontier.append(successor)
-                        #if(successor.id != curr.id):
-                        #    frontier.append(successor)
-            #debuging: print(x_coord)
-            x_coord += 1
-        
-        y_coord += 1
-    #now need to check if the two empty square is next to each other
-    first_empty = empty_squares[0]
-    second_empty = empty_squares[1]
-    #first_empty[0] is y coordinate, first_empty[1] is x coordinate
-    if ((first_empty[0]+1 == second_empty[0]) and (first_empty[1] == second_empty[1])) or ((first_empty[0]-1 == second_empty[0]) and (first_empty[1] == second_empty[1])): #vertical empty column
-        #do: create_a_successor for the horizontal movement
-        empty_col_y = min(first_empty[0], second_empty[0])
-        empty_col_x = first_empty[1]
-        for d in direction:
-            #//3:02 AM Feb 3rd take a break now to get popeye continue from here
-            if d == 'left' and (empty_col_x-1) >= 0 and curr.board.grid[empty_col_y][empty_col_x-1] == '^': # there can be movemnent for piece 'v'
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x-1), 'left','v' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-            elif d == 'left' and (empty_col_x-2) >= 0 and curr.board.grid[empty_col_y][empty_col_x-1] == '1': # there can be movemnent for piece '1' #8
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x-2), 'left','1' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-            elif d == 'right' and (empty_col_x+1) <= 3 and curr.board.grid[empty_col_y][empty_col_x+1] == '^': # there can be movemnent for piece 'v'
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x+1), 'right','v' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-            elif d == 'right' and (empty_col_x+2) <= 3 and curr.board.grid[empty_col_y][empty_col_x+1] == '1': # there can be movemnent for piece '1'
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x+1), 'right','1' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-
-    if ((first_empty[1]+1 == second_empty[1]) and (first_empty[0] == second_empty[0])) or ((first_empty[1]-1 == second_empty[1]) and (first_empty[0] == second_empty[0])): #horizontal empty row
-        #do: create_a_successor for the vertial movement
-        empty_col_y = first_empty[0]
-        empty_col_x = min(first_empty[1], second_empty[1] )
-        #print('first_empty x:'first_empty[1])
-        #print('second_empty x:'second_empty[1])
-        #print('empty_col_x = min :', empty_col_x)
-        for d in direction:
-            if d == 'up' and (empty_col_y-1) >= 0 and curr.board.grid[empty_col_y-1][empty_col_x] == '<': # there can be movemnent for piece 'v'
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y-1), (empty_col_x), 'up','h' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-            elif d == 'up' and (empty_col_y-2) >= 0 and curr.board.grid[empty_col_y-1][empty_col_x] == '1': # there can be movemnent for piece '1' #12 #bug detected
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y-2), (empty_col_x), 'up','1' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-                #print('first_empty x:',first_empty[1])
-                #print('second_empty x:',second_empty[1])
-                #print('empty_col_x = min :', empty_col_x)
-            elif d == 'down' and (empty_col_y+1) <= 4 and curr.board.grid[empty_col_y+1][empty_col_x] == '<': # there can be movemnent for piece 'v'
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y+1), (empty_col_x), 'down','h' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-            elif d == 'down' and (empty_col_y+2) <= 4 and curr.board.grid[empty_col_y+1][empty_col_x] == '1': # there can be movemnent for piece '1'
-                successor = create_a_successor(curr, empty_col_y, empty_col_x,(empty_col_y+1), (empty_col_x), 'down','1' )
-                frontier.append(successor)
-                #if(successor.id != curr.id):
-                #    frontier.append(successor)
-    #print("frontier has: ", len(frontier))
-    
-    
+    hash_count = 4
 
-def dfs(board):
+    def __init__(self, size_mb=16):
+        """
+        :param size_mb: Memory for the bit array in megabytes.
+        :type size_mb: float
+        """
+        self.size = max(64, int(size_mb * 2 ** 20) * 8)
+        self.bits = bytearray(self.size // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def positions(self, key):
+        # double hashing: position i is h1 + i * h2. Both take the top half of a multiply,
+        # the bits that depend on every bit of the id, and each position is scaled to the
+        # bit array from the top down; a modulo would keep only the low, poorly mixed bits
+        # whenever the size is a power of two.
+        h1 = ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32
+        h2 = ((key * 0xC2B2AE3D27D4EB4F) & 0xFFFFFFFFFFFFFFFF) >> 32 | 1
+        size = self.size
+        return [((h1 + i * h2) & 0xFFFFFFFF) * size >> 32 for i in range(self.hash_count)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self.positions(key))
+
+    def add(self, key):
+        bits = self.bits
+        for p in self.positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def bytes_used(self):
+        return len(self.bits)
+
+closed_sets = {'set': set, 'table': KeyTable, 'bloom': BloomFilter}
+
+def make_closed_set(kind='set', bloom_mb=16):
+    if kind == 'bloom':
+        return BloomFilter(bloom_mb)
+    return closed_sets[kind]()
+
+def closed_bytes_per_state(closed):
+    # what a closed set or best g map spends on each board it holds
+    if not len(closed):
+        return 0.0
+    if isinstance(closed, (set, dict)):
+        # the table itself plus an int object for every key
+        return (sys.getsizeof(closed) + len(closed) * sys.getsizeof(1 << 59)) / len(closed)
+    return closed.bytes_used() / len(closed)
+
+
+def dfs(board, symmetry=False, stats=None, verbose=0, closed='set', bloom_mb=16):
     
+    if stats is None:
+        stats = SearchStats()
+    # the frontier holds node indexes; the nodes themselves live in the store
+    store = NodeStore()
+    keys, parents, depths, empty_pairs = store.keys, store.parents, store.depths, store.empty_pairs
+    add_key, add_parent, add_depth, add_empty_pair = keys.append, parents.append, depths.append, empty_pairs.append
     frontier = []
-    #explored = []
-    #explored_ids = [] # give it a try to see if fix the problem
-    explored_ids = set()
-    init_state = State( board, 0, 0, None)
-    frontier.append(init_state)
-    #dfs_while_loop_couner = 0
-    #count_for_break_while_loop = 0
+    explored_ids = make_closed_set(closed, bloom_mb)
+    # with symmetry on, a board and its mirror image share one entry in explored_ids
+    explored_key = canonical_key if symmetry else int
+    init_id = hash_board_config(board)
+    frontier.append(store.add(init_id, -1, 0, empty_pair_of(init_id)))
+    push = frontier.append
+    # the counters live in locals while the search runs and go into stats at the end
+    generated = 1
+    duplicates = 0
+    peak_frontier = 1
+    movegen_seconds = hash_seconds = 0.0
+    reach_goal = None
     while(len(frontier)!= 0 ):
         
-        #print("dfs_while_loop_couner: ", dfs_while_loop_couner)
-        #dfs_while_loop_couner += 1
-        #curr = frontier[-1] #curr is a state
+        if len(frontier) > peak_frontier:
+            peak_frontier = len(frontier)
         curr = frontier.pop()
-        #print("a2")
-        #helper function to check if curr is explored #bool def is_explored(curr, explored)
-        #curr_is_explored = is_explored(curr, explored)
-        #curr_id_is_explored = is_id_explored(curr.id, explored_ids )
-        #print('curr_is_explored: ', curr_is_explored)
-        #print('curr_id_is_explored: ', curr_id_is_explored)
-        if not curr.id in explored_ids: #curr_is_explored
-        #if curr_id_is_explored == False: #curr_is_explored
-            #explored.append(curr)
-            #explored_ids.append(curr.id)
-            explored_ids.add(curr.id)
-            print(curr.id)
-            #need helper function to check if this board config is the same as goal board config, deep board compare
-            #bool def is_at_goal(curr.board) implemented
-            reached_goal = is_at_goal(curr)
-            #print('reached_goal? :', reached_goal )
-            if reached_goal == True:
-                #print("b")
-                return curr #curr contains the parent, so this helps us to trace the path, we will need to implement the adding parent featrue
-            else:
-                #print("c")
-                #do: add curr's successors to Frontier #also put the parrent = curr for all the succesors
-                #def add_curr_succ_to_frontier(curr, frontier)
-                add_curr_succ_to_frontier(curr, frontier)
-                #print('frontier[] now has: ', len(frontier))
-        ''' 
-        count_for_break_while_loop += 1
-        if count_for_break_while_loop  <-70:
-            print("forced break here:")
-            print("length of explored: ", len(explored))
-            test_pruning_write_to_text_dfs(explored)
+        key = keys[curr]
+        start = perf_counter()
+        curr_key = explored_key(key)
+        curr_is_explored = curr_key in explored_ids
+        if not curr_is_explored:
+            explored_ids.add(curr_key)
+        hashed = perf_counter()
+        hash_seconds += hashed - start
+        if curr_is_explored:
+            duplicates += 1
+            continue
+        if verbose >= 2:
+            print(key)
+        if (key & goal_mask) == goal_bits:
+            reach_goal = curr
             break
-        '''
+        #add curr's successors to Frontier, their parent is curr
+        depth = depths[curr] + 1
+        for mask, bits, delta, empty_pair in move_table[empty_pairs[curr]]:
+            if key & mask == bits:
+                push(len(keys))
+                add_key(key ^ delta)
+                add_parent(curr)
+                add_depth(depth)
+                add_empty_pair(empty_pair)
+        movegen_seconds += perf_counter() - hashed
+
+    stats.generated = len(store)
+    stats.expanded = len(explored_ids)
+    stats.duplicates = duplicates
+    stats.peak_frontier = peak_frontier
+    stats.peak_closed = len(explored_ids)
+    stats.movegen_seconds = movegen_seconds
+    stats.hash_seconds = hash_seconds
+    stats.node_bytes = store.bytes_per_node()
+    stats.closed_bytes = closed_bytes_per_state(explored_ids)
+    if reach_goal is None:
+        return None
+    return store.state(reach_goal)
 
     #board.display()
     #return reach_goal
@@ -498,74 +766,95 @@ def dfs(board):
         #else: //do nothing , it will start the while loop again
     '''
     
-#def order_ini_to_goal(reach_goal):
-
-def list_goal_to_init(reach_goal):
-    list_to_write_on_txt = []
-    current = reach_goal
-    next = current.parent
-    list_to_write_on_txt.append(current)
-    while(next != None):
-        current = current.parent
-        list_to_write_on_txt.append(current)
-        next = current.parent
-    
-    return list_to_write_on_txt
+#-------------------------------------------Below is the solution writer----------------------------------------------
+# A solution is written straight from the parent chain. Every board takes the same 26
+# characters (5 rows of 4 plus newline, then a blank line) and the depth of each state is
+# its position in the solution, so the chain is walked once from the goal, each board
+# dropped into its slot of one buffer, and the buffer written in one go.
+#
+# The compact 'moves' format is the initial board, a blank line, then one
+# "y:x,direction" line per move: the piece whose top left corner is at row y, column x
+# moves one cell in that direction. expand_moves turns it back into the grid format.
+
+board_text_size = 26
+
+def build_row_text():
+    table = []
+    for bits in range(1 << row_bits):
+        codes = [(bits >> (cell_bits * x)) & cell_mask for x in range(4)]
+        table.append(''.join(cell_chars[code] if code < len(cell_chars) else '?' for code in codes) + '\n')
+    return table
+
+row_text = build_row_text()
+
+def board_text(key):
+    return ''.join([row_text[(key >> (row_bits * y)) & row_mask] for y in range(5)]) + '\n'
+
+def solution_moves(reach_goal):
+    # the move tokens from the initial board to reach_goal, in order
+    moves = [None] * reach_goal.depth
+    curr = reach_goal
+    while curr.parent is not None:
+        y, x, direction = move_names[(curr.parent.empty_pair, curr.parent.id ^ curr.id)]
+        moves[curr.depth - 1] = '{}:{},{}\n'.format(y, x, direction)
+        curr = curr.parent
+    return curr.id, moves
+
+def solution_text(reach_goal, fmt='grid'):
+    """
+    The text of the solution ending at reach_goal.
+
+    :param reach_goal: The goal state; its parent chain leads back to the initial board.
+    :type reach_goal: State
+    :param fmt: 'grid' for every board of the solution, 'moves' for the initial board and the moves.
+    :type fmt: str
+    :rtype: bytes
+    """
+    if fmt == 'moves':
+        init_id, moves = solution_moves(reach_goal)
+        return (board_text(init_id) + ''.join(moves)).encode()
+
+    buffer = bytearray(board_text_size * (reach_goal.depth + 1))
+    curr = reach_goal
+    while curr is not None:
+        start = board_text_size * curr.depth
+        buffer[start:start + board_text_size] = board_text(curr.id).encode()
+        curr = curr.parent
+    return buffer
+
+def write_to_text(reach_goal, filename, fmt='grid'):
+    """
+    Write the solution ending at reach_goal, in the format of solution_text.
+    """
+    with open(filename, "wb") as f:
+        f.write(solution_text(reach_goal, fmt))
+
+shape_of_char = {char_goal: '1', char_single: '2', '<': 'h', '^': 'v'}
+
+def expand_moves(moves_filename, filename):
+    # replay a 'moves' format solution and write it in the grid format
+    with open(moves_filename) as f:
+        lines = f.read().split('\n')
+    key = encode_pieces(read_board_lines(lines[:5]).pieces)
+    empty_pair = empty_pair_of(key)
+    with open(filename, "w") as f:
+        f.write(board_text(key))
+        for token in lines[6:]:
+            if not token.strip():
+                continue
+            cell, direction = token.strip().split(',')
+            y, x = (int(n) for n in cell.split(':'))
+            shape = shape_of_char.get(cell_at(key, y, x)) if 0 <= y < 5 and 0 <= x < 4 else None
+            delta = move_deltas.get((shape, y, x, direction))
+            for mask, bits, move_delta, succ_pair in move_table[empty_pair]:
+                if move_delta == delta and key & mask == bits:
+                    break
+            else:
+                raise ValueError('illegal move {}'.format(token.strip()))
+            key ^= delta
+            empty_pair = succ_pair
+            f.write(board_text(key))
 
-def write_to_text(reach_goal):
-    list_to_write_on_txt = list_goal_to_init(reach_goal)
-    f = open(output_file, "w")
-    
-    while(len(list_to_write_on_txt) != 0):
-        last = list_to_write_on_txt[-1]
-        count_y = 0
-        for y in last.board.grid:
-            #print(last.board.grid[count_y])
-            f.writelines(last.board.grid[count_y])
-            f.write("\n")
-            count_y += 1
-        f.write("\n")
-        list_to_write_on_txt.pop()
-    f.close()
-
-def test_pruning_write_to_text_dfs(list_states):
-    #list_to_write_on_txt = list_goal_to_init(reach_goal)
-    f = open(output_file, "w")
-    
-    while(len(list_states) != 0):
-        print(type(list_states[0]))
-        first = list_states[0].board.grid
-        count_y = 0
-        for y in first:
-            print(first[count_y])
-            f.writelines(first[count_y])
-            f.write("\n")
-            count_y += 1
-        f.write("\n")
-        list_states.pop(0)
-    f.close()
-
-def write_a_grid_txt(grid):
-    f = open(output_file, "w")
-    count_y = 0
-    for y in grid:
-        print(grid[count_y])
-        f.writelines(grid[count_y])
-        f.write("\n")
-        count_y += 1
-    f.write("\n")
-    f.close()
-    '''    
-    for each_config in list_to_write_on_txt:
-        count_y = 0
-        for y in each_config.board.grid:
-            print(each_config.board.grid[count_y])
-            f.writelines(each_config.board.grid[count_y])
-            f.write("\n")
-            count_y += 1
-        f.write("\n")
-    f.close()
-    '''
 #-------------------------------------------Below is astar----------------------------------------------
 def manhattan_h(curr_goal_x, curr_goal_y):
     goal_x = 1  
@@ -575,158 +864,17 @@ def manhattan_h(curr_goal_x, curr_goal_y):
     h = x_d + y_d
     return h
 
+def goal_position(key):
+    # the goal code is 0b001, so its cells are the ones with bit 0 set and bits 1, 2 clear.
+    # The lowest of them is the top left corner of the goal piece.
+    goal_cells = key & ~(key >> 1) & ~(key >> 2) & cell_low_bits
+    cell = ((goal_cells & -goal_cells).bit_length() - 1) // cell_bits
+    return cell // 4, cell % 4
 
-def create_a_successor_astar(curr, empty_y, empty_x, piece_y, piece_x, d, shape ):
-    curr_f = curr.f
-    curr_depth = curr.depth
-    deepcopied_pieces = deepcopy(curr.board.pieces)
-    
-    for p in deepcopied_pieces:
-        if (d=='up' or d=='down' or d=='left' or d=='right') and shape=='2' and p.is_single==True and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-        elif d=='up' and shape=='v'and p.orientation=='v' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y - 1
-            p.coord_x = empty_x
-        elif d=='down' and shape=='v' and p.orientation=='v' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-        elif d=='left' and shape=='h' and p.orientation=='h' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x - 1
-        elif d=='right' and shape=='h' and p.orientation=='h' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-        elif (d=='left' or d=='right') and shape=='v' and p.orientation=='v' and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-        elif d=='left' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x: #8
-            p.coord_y = empty_y
-            p.coord_x = empty_x-1
-        elif d=='right' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x:
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-        elif (d=='up' or d=='down') and shape=='h' and p.orientation=='h' and p.coord_y==piece_y and p.coord_x==piece_x: #11 and #14
-            p.coord_y = empty_y
-            p.coord_x = empty_x
-        elif d=='up' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x: #12
-            p.coord_y = empty_y-1
-            p.coord_x = empty_x
-        elif d=='down' and shape=='1' and p.is_goal==True and p.coord_y==piece_y and p.coord_x==piece_x: #13
-            p.coord_y = empty_y
-            p.coord_x = empty_x 
-
-    new_identical_board = Board(deepcopied_pieces)
-    #board, f, depth, parent=None 
-    curr_goal_x = None
-    curr_goal_y = None
-    for p in new_identical_board.pieces:
-        if p.is_goal == True:
-            curr_goal_x = p.coord_x
-            curr_goal_y = p.coord_y
-
-    h_for_this_succ = manhattan_h(curr_goal_x, curr_goal_y)
-    successor = State( new_identical_board, (h_for_this_succ + curr_depth + 1), curr_depth+1, curr)
-    #successor.board.grid = []
-    #successor.board._Board__construct_grid()
-    #successor.board.display()
-    successor.id = hash_board_config(successor.board) 
-    return successor
-
+def key_manhattan_h(key):
+    curr_goal_y, curr_goal_x = goal_position(key)
+    return manhattan_h(curr_goal_x, curr_goal_y)
 
-def add_curr_succ_to_frontier_astar(curr, frontier):
-    direction = ['up', 'down', 'left', 'right']
-    empty_squares = []
-    y_coord = 0
-    #print('add_curr_succ_to_frontier')
-    for y in curr.board.grid: #start with y-axis
-        x_coord = 0
-        #debuging: print("y loop:" + str(y_coord))
-        for x in y: #then x-axis
-            if x == '.':
-                empty_squares.append([y_coord, x_coord]) #will be used for cheking if two . are next to each other
-                for d in direction:
-                    if d == 'up' and (y_coord-1) >= 0 and curr.board.grid[y_coord-1][x_coord] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,(y_coord-1),x_coord, 'up', '2' )
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-                    elif d == 'up' and (y_coord-2) >= 0 and curr.board.grid[y_coord-1][x_coord] == 'v': # there can be movemnent for piece 'v'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,(y_coord-2),x_coord, 'up','v' )
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-                    elif d == 'down' and (y_coord+1) <= 4 and curr.board.grid[y_coord+1][x_coord] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,(y_coord+1),x_coord, 'down', '2' ) #this line cuz rasing errors!!!
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-                    elif d == 'down' and (y_coord+2) <= 4 and curr.board.grid[y_coord+1][x_coord] == '^': # there can be movemnent for piece 'v'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,(y_coord+1),x_coord, 'down','v' )
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-                    elif d == 'left' and (x_coord-1) >= 0 and curr.board.grid[y_coord][x_coord-1] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,y_coord, (x_coord-1), 'left', '2' )
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-                    elif d == 'left' and (x_coord-2) >= 0 and curr.board.grid[y_coord][x_coord-1] == '>': # there can be movemnent for piece 'v'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,(y_coord), (x_coord-2), 'left','h' )
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-                    elif d == 'right' and (x_coord+1) <= 3 and curr.board.grid[y_coord][x_coord+1] == '2': # there can be movemnent for piece '2'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,y_coord, (x_coord+1), 'right', '2' )
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-                    elif d == 'right' and (x_coord+2) <= 3 and curr.board.grid[y_coord][x_coord+1] == '<': # there can be movemnent for piece 'v'
-                        successor = create_a_successor_astar(curr, y_coord, x_coord,y_coord, (x_coord+1), 'right','h' )
-                        #frontier.append(successor)
-                        heappush(frontier, (successor.f, successor))
-            x_coord += 1    
-        y_coord += 1
-    #now need to check if the two empty square is next to each other
-    first_empty = empty_squares[0]
-    second_empty = empty_squares[1]
-    #first_empty[0] is y coordinate, first_empty[1] is x coordinate
-    if ((first_empty[0]+1 == second_empty[0]) and (first_empty[1] == second_empty[1])) or ((first_empty[0]-1 == second_empty[0]) and (first_empty[1] == second_empty[1])): #vertical empty column
-        #do: create_a_successor for the horizontal movement
-        empty_col_y = min(first_empty[0], second_empty[0])
-        empty_col_x = first_empty[1]
-        for d in direction:
-            if d == 'left' and (empty_col_x-1) >= 0 and curr.board.grid[empty_col_y][empty_col_x-1] == '^': # there can be movemnent for piece 'v'
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x-1), 'left','v' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
-            elif d == 'left' and (empty_col_x-2) >= 0 and curr.board.grid[empty_col_y][empty_col_x-1] == '1': # there can be movemnent for piece '1' #8
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x-2), 'left','1' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
-            elif d == 'right' and (empty_col_x+1) <= 3 and curr.board.grid[empty_col_y][empty_col_x+1] == '^': # there can be movemnent for piece 'v'
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x+1), 'right','v' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
-            elif d == 'right' and (empty_col_x+2) <= 3 and curr.board.grid[empty_col_y][empty_col_x+1] == '1': # there can be movemnent for piece '1'
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y), (empty_col_x+1), 'right','1' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
-
-    if ((first_empty[1]+1 == second_empty[1]) and (first_empty[0] == second_empty[0])) or ((first_empty[1]-1 == second_empty[1]) and (first_empty[0] == second_empty[0])): #horizontal empty row
-        #do: create_a_successor for the vertial movement
-        empty_col_y = first_empty[0]
-        empty_col_x = min(first_empty[1], second_empty[1] )
-        for d in direction:
-            if d == 'up' and (empty_col_y-1) >= 0 and curr.board.grid[empty_col_y-1][empty_col_x] == '<': # there can be movemnent for piece 'v'
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y-1), (empty_col_x), 'up','h' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
-            elif d == 'up' and (empty_col_y-2) >= 0 and curr.board.grid[empty_col_y-1][empty_col_x] == '1': # there can be movemnent for piece '1' #12 #bug detected
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y-2), (empty_col_x), 'up','1' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
-            elif d == 'down' and (empty_col_y+1) <= 4 and curr.board.grid[empty_col_y+1][empty_col_x] == '<': # there can be movemnent for piece 'v'
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y+1), (empty_col_x), 'down','h' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
-            elif d == 'down' and (empty_col_y+2) <= 4 and curr.board.grid[empty_col_y+1][empty_col_x] == '1': # there can be movemnent for piece '1'
-                successor = create_a_successor_astar(curr, empty_col_y, empty_col_x,(empty_col_y+1), (empty_col_x), 'down','1' )
-                #frontier.append(successor)
-                heappush(frontier, (successor.f, successor))
 
 def find_lowest_f(frontier):
     fron_w_lowest_f = frontier[0]
@@ -737,29 +885,2822 @@ def find_lowest_f(frontier):
             ind_w_lowest_f = index
     return ind_w_lowest_f
 
-def astar(board):
-    frontier = []
-    explored_ids = set()
-    init_state = State( board, 0, 0, None)
-    #frontier.append(init_state)
-    heappush(frontier, (init_state.f, init_state))
+# A heap entry is one int, f above g above the node index, so entries compare as plain
+# ints. g is stored as open_g_limit - g, so on equal f the board with the larger g (the
+# smaller h) comes out first.
+open_g_bits = 20
+open_g_limit = (1 << open_g_bits) - 1
+open_index_mask = (1 << 32) - 1
+
+class OpenList:
+    """
+    The astar frontier over the nodes of a NodeStore. It remembers the best g each board
+    has been reached with and drops a push that cannot improve on it, so a board is in the
+    heap at most once per improvement. The heap holds single int entries.
+    """
+
+    def __init__(self, store, explored_key=int, best_g=None):
+        """
+        :param store: The nodes the entries refer to.
+        :type store: NodeStore
+        :param explored_key: Maps an id to the key boards are told apart by, e.g. canonical_key.
+        :type explored_key: Callable[[int], int]
+        :param best_g: The map from board to best g, a dict by default or a KeyTable with values.
+        :type best_g: Optional[Union[dict, KeyTable]]
+        """
+        self.store = store
+        self.explored_key = explored_key
+        self.heap = []
+        self.best_g = {} if best_g is None else best_g
+        self.stale = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def improves(self, key, g):
+        """
+        Tell whether reaching key with g beats every earlier way of reaching it.
+        """
+        best = self.best_g.get(self.explored_key(key))
+        return best is None or g < best
+
+    def push(self, index, f):
+        g = self.store.depths[index]
+        self.best_g[self.explored_key(self.store.keys[index])] = g
+        heappush(self.heap, (f << (open_g_bits + 32)) | ((open_g_limit - g) << 32) | index)
+
+    def pop(self):
+        """
+        Remove and return the node with the lowest f, or None when the list is empty.
+        Entries for a board that was reached again with a lower g since are skipped.
+        """
+        heap = self.heap
+        keys = self.store.keys
+        while heap:
+            entry = heappop(heap)
+            index = entry & open_index_mask
+            if self.best_g[self.explored_key(keys[index])] == open_g_limit - ((entry >> 32) & open_g_limit):
+                return index
+            self.stale += 1
+        return None
+
+    def peek(self):
+        """
+        The heap entry pop would return the node of next, or None when the list is empty.
+        """
+        heap = self.heap
+        keys = self.store.keys
+        while heap:
+            index = heap[0] & open_index_mask
+            if self.best_g[self.explored_key(keys[index])] == open_g_limit - ((heap[0] >> 32) & open_g_limit):
+                return heap[0]
+            heappop(heap)
+            self.stale += 1
+        return None
+
+
+class BucketOpenList(OpenList):
+    """
+    An OpenList whose heap is replaced by one bucket per f value and a pointer to the
+    lowest bucket that may be non-empty. Every move costs one and the heuristics return
+    small ints, so there are few buckets, and push and pop take constant time. A bucket
+    is a stack, so among boards with equal f the most recently generated, usually the
+    deepest, comes out first.
+    """
+
+    def __init__(self, store, explored_key=int, best_g=None):
+        OpenList.__init__(self, store, explored_key, best_g)
+        self.buckets = []
+        self.min_f = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, index, f):
+        g = self.store.depths[index]
+        self.best_g[self.explored_key(self.store.keys[index])] = g
+        while len(self.buckets) <= f:
+            self.buckets.append([])
+        self.buckets[f].append((g << 32) | index)
+        self.count += 1
+        # an inconsistent heuristic can put a child below its parent's f
+        if f < self.min_f:
+            self.min_f = f
+
+    def pop(self):
+        buckets = self.buckets
+        keys = self.store.keys
+        while self.min_f < len(buckets):
+            bucket = buckets[self.min_f]
+            while bucket:
+                entry = bucket.pop()
+                self.count -= 1
+                index = entry & open_index_mask
+                if self.best_g[self.explored_key(keys[index])] == entry >> 32:
+                    return index
+                self.stale += 1
+            self.min_f += 1
+        return None
+
+    def peek(self):
+        # in the layout of the heap entries, so callers need not know which list they have
+        buckets = self.buckets
+        keys = self.store.keys
+        while self.min_f < len(buckets):
+            bucket = buckets[self.min_f]
+            while bucket:
+                index = bucket[-1] & open_index_mask
+                g = bucket[-1] >> 32
+                if self.best_g[self.explored_key(keys[index])] == g:
+                    return (self.min_f << (open_g_bits + 32)) | ((open_g_limit - g) << 32) | index
+                bucket.pop()
+                self.count -= 1
+                self.stale += 1
+            self.min_f += 1
+        return None
+
+open_lists = {'heap': OpenList, 'buckets': BucketOpenList}
+
+def astar(board, symmetry=False, heuristic=key_manhattan_h, stats=None, verbose=0, frontier='heap', closed='set',
+          weight=1):
+    # with weight W > 1 this is weighted astar, f = g + W * h, and the solution is at most W
+    # times longer than the shortest. W * h is rounded down to keep f an int, which keeps the bound.
+    if stats is None:
+        stats = SearchStats()
+    # the open list holds node indexes; the nodes themselves live in the store
+    store = NodeStore()
+    keys, parents, depths, empty_pairs = store.keys, store.parents, store.depths, store.empty_pairs
+    add_key, add_parent, add_depth, add_empty_pair = keys.append, parents.append, depths.append, empty_pairs.append
+    # with symmetry on, a board and its mirror image share one entry in the open list
+    # its best g map is also the closed set; a Bloom filter cannot hold g, so there is no bloom here
+    best_g = KeyTable(values=True) if closed == 'table' else {}
+    frontier = open_lists[frontier](store, canonical_key if symmetry else int, best_g)
+    init_id = hash_board_config(board)
+    frontier.push(store.add(init_id, -1, 0, empty_pair_of(init_id)), int(weight * heuristic(init_id)))
+    # the counters live in locals while the search runs and go into stats at the end
+    generated = 1
+    expanded = 0
+    rejected = 0
+    peak_frontier = 1
+    movegen_seconds = hash_seconds = heap_seconds = 0.0
+    reach_goal = None
     while(len(frontier)!= 0 ):
-        #do: helper function that finds the smallest f value
-        #ind_w_lowest_f = find_lowest_f(frontier)
-        #curr = frontier.pop(ind_w_lowest_f)
-        curr_tuple = heappop(frontier)
-        curr = curr_tuple[1]
-        if not curr.id in explored_ids: #curr_is_explored
-            explored_ids.add(curr.id)
-            print(curr.id)
-            reached_goal = is_at_goal(curr)
-            if reached_goal == True:
-                return curr #curr contains the parent, so this helps us to trace the path, we will need to implement the adding parent featrue
+        if len(frontier) > peak_frontier:
+            peak_frontier = len(frontier)
+        start = perf_counter()
+        curr = frontier.pop()
+        popped = perf_counter()
+        heap_seconds += popped - start
+        if curr is None:
+            break
+        expanded += 1
+        key = keys[curr]
+        if verbose >= 2:
+            print(key)
+        if (key & goal_mask) == goal_bits:
+            reach_goal = curr
+            break
+        g = depths[curr] + 1
+        children = [(key ^ delta, empty_pair) for mask, bits, delta, empty_pair in move_table[empty_pairs[curr]]
+                    if key & mask == bits]
+        generated += len(children)
+        moved = perf_counter()
+        improving = [child for child in children if frontier.improves(child[0], g)]
+        rejected_at = perf_counter()
+        rejected += len(children) - len(improving)
+        successors = []
+        for succ_id, empty_pair in improving:
+            successors.append((len(keys), g + int(weight * heuristic(succ_id))))
+            add_key(succ_id)
+            add_parent(curr)
+            add_depth(g)
+            add_empty_pair(empty_pair)
+        built = perf_counter()
+        for index, f in successors:
+            frontier.push(index, f)
+        movegen_seconds += (moved - popped) + (built - rejected_at)
+        hash_seconds += rejected_at - moved
+        heap_seconds += perf_counter() - built
+
+    stats.generated = generated
+    stats.expanded = expanded
+    stats.duplicates = rejected + frontier.stale
+    stats.peak_frontier = peak_frontier
+    stats.peak_closed = expanded
+    stats.movegen_seconds = movegen_seconds
+    stats.hash_seconds = hash_seconds
+    stats.heap_seconds = heap_seconds
+    stats.node_bytes = store.bytes_per_node()
+    stats.closed_bytes = closed_bytes_per_state(best_g)
+    stats.bound = weight
+    if reach_goal is None:
+        return None
+    return store.state(reach_goal)
+
+
+# weight of the first arastar iteration when --weight is not given, and how much each
+# later iteration takes off until it reaches 1
+arastar_weight = 3.0
+arastar_step = 0.5
+
+def arastar(board, heuristic=key_manhattan_h, stats=None, weight=arastar_weight, time_limit=None):
+    """
+    Anytime repairing astar: a series of weighted astar searches with a falling weight, each
+    solution at most weight times longer than the shortest. A later iteration keeps the
+    nodes, g values and heap of the earlier ones and only re-expands the boards whose g
+    went down since they were expanded (the inconsistent ones), rather than starting over.
+
+    :param board: The initial board.
+    :type board: Board
+    :param heuristic: Maps a packed id to a lower bound on its moves to the goal.
+    :type heuristic: Callable[[int], int]
+    :param stats: Filled in with the search counters when given.
+    :type stats: Optional[SearchStats]
+    :param weight: The weight of the first iteration.
+    :type weight: float
+    :param time_limit: Seconds after which the best solution so far is returned. The search
+        still runs until it has a first solution.
+    :type time_limit: Optional[float]
+    :return: The goal state of the best solution found, or None if there is none.
+    :rtype: Optional[State]
+    """
+    if stats is None:
+        stats = SearchStats()
+    start = perf_counter()
+    store = NodeStore()
+    keys, depths, empty_pairs = store.keys, store.depths, store.empty_pairs
+    # the heuristic of every node, so the heap can be rebuilt for a new weight
+    hs = array('I')
+    frontier = OpenList(store)
+    best_g = frontier.best_g
+    init_id = hash_board_config(board)
+    hs.append(heuristic(init_id))
+    frontier.push(store.add(init_id, -1, 0, empty_pair_of(init_id)), int(weight * hs[0]))
+    incumbent = None
+    generated = 1
+    expanded = 0
+    solutions = []
+    while True:
+        # boards expanded in this iteration, and those whose g fell after their expansion
+        closed = set()
+        incons = []
+        out_of_time = False
+        while len(frontier):
+            if incumbent is not None:
+                # stop once nothing left can beat the incumbent with this weight
+                top = frontier.peek()
+                if top is None or top >> (open_g_bits + 32) >= depths[incumbent]:
+                    break
+                if time_limit is not None and expanded & 0xFF == 0 and perf_counter() - start > time_limit:
+                    out_of_time = True
+                    break
+            curr = frontier.pop()
+            if curr is None:
+                break
+            key = keys[curr]
+            if (key & goal_mask) == goal_bits:
+                if incumbent is None or depths[curr] < depths[incumbent]:
+                    incumbent = curr
+                continue
+            closed.add(key)
+            expanded += 1
+            g = depths[curr] + 1
+            for succ_id, succ_pair in successor_keys(key, empty_pairs[curr]):
+                generated += 1
+                if not frontier.improves(succ_id, g):
+                    continue
+                h = heuristic(succ_id)
+                index = store.add(succ_id, curr, g, succ_pair)
+                hs.append(h)
+                if succ_id in closed:
+                    best_g[succ_id] = g
+                    incons.append(index)
+                else:
+                    frontier.push(index, g + int(weight * h))
+        if incumbent is None:
+            break
+        # a shorter solution than the incumbent has to go through a board left unexpanded,
+        # so their lowest g + h bounds the shortest solution from below
+        lower = min([depths[incumbent]] + [depths[i] + hs[i] for i in incons] +
+                    [depths[entry & open_index_mask] + hs[entry & open_index_mask] for entry in frontier.heap
+                     if best_g[keys[entry & open_index_mask]] == depths[entry & open_index_mask]])
+        bound = min(weight, depths[incumbent] / lower) if lower else 1.0
+        solutions.append({'seconds': round(perf_counter() - start, 6), 'moves': depths[incumbent],
+                          'weight': weight, 'bound': bound})
+        if bound <= 1 or out_of_time or (time_limit is not None and perf_counter() - start > time_limit):
+            break
+        # next iteration: a lower weight, the inconsistent boards back in, every f recomputed
+        weight = max(1.0, weight - arastar_step)
+        entries = [entry & open_index_mask for entry in frontier.heap] + incons
+        frontier.heap = []
+        for index in entries:
+            if best_g[keys[index]] == depths[index]:
+                g = depths[index]
+                frontier.heap.append((g + int(weight * hs[index])) << (open_g_bits + 32) |
+                                     (open_g_limit - g) << 32 | index)
+        heapify(frontier.heap)
+
+    stats.generated = generated
+    stats.expanded = expanded
+    stats.node_bytes = store.bytes_per_node()
+    stats.bound = solutions[-1]['bound'] if solutions else None
+    stats.solutions = solutions
+    if incumbent is None:
+        return None
+    return store.state(incumbent)
+
+#-------------------------------------------Below is the distance database----------------------------------------------
+# For a fixed piece set every reachable board can be solved ahead of time: a breadth first
+# search backwards from all goal boards gives the exact number of moves left for each board.
+# The distances are stored on disk as a sorted array of packed ids plus a parallel array of
+# distances, so the rank of an id in the first array is where its distance lives.
+
+def piece_set_of(key):
+    # (vertical 1x2, horizontal 1x2, 1x1) piece counts, there is always exactly one goal piece
+    counts = {'^': 0, '<': 0, char_single: 0}
+    for y in range(5):
+        for x in range(4):
+            ch = cell_at(key, y, x)
+            if ch in counts:
+                counts[ch] += 1
+    return counts['^'], counts['<'], counts[char_single]
+
+def successor_keys(key, empty_pair):
+    for mask, bits, delta, succ_pair in move_table[empty_pair]:
+        if key & mask == bits:
+            yield key ^ delta, succ_pair
+
+def enumerate_goal_keys(piece_set):
+    """
+    List every board with the given pieces that satisfies is_at_goal.
+
+    :param piece_set: (vertical 1x2, horizontal 1x2, 1x1) piece counts.
+    :type piece_set: Tuple[int, int, int]
+    :return: The packed ids of all goal boards.
+    :rtype: List[int]
+    """
+    n_v, n_h, n_single = piece_set
+    n_empty = 16 - 2 * n_v - 2 * n_h - n_single
+    if n_empty < 0:
+        raise ValueError('the pieces {} do not fit on the board'.format(piece_set))
+
+    goal_keys = []
+
+    def fill(cell, key, occupied, n_v, n_h, n_single, n_empty):
+        while cell < 20 and occupied >> cell & 1:
+            cell += 1
+        if cell == 20:
+            goal_keys.append(key)
+            return
+        y, x = divmod(cell, 4)
+        taken = occupied | 1 << cell
+        if n_empty:
+            fill(cell + 1, key, taken, n_v, n_h, n_single, n_empty - 1)
+        if n_single:
+            fill(cell + 1, key | piece_bits('2', y, x), taken, n_v, n_h, n_single - 1, n_empty)
+        if n_h and x < 3 and not occupied >> (cell + 1) & 1:
+            fill(cell + 2, key | piece_bits('h', y, x), taken | 1 << (cell + 1), n_v, n_h - 1, n_single, n_empty)
+        if n_v and y < 4:
+            fill(cell + 1, key | piece_bits('v', y, x), taken | 1 << (cell + 4), n_v - 1, n_h, n_single, n_empty)
+
+    goal_occupied = sum(1 << c for c in piece_cell_set('1', 3, 1))
+    fill(0, piece_bits('1', 3, 1), goal_occupied, n_v, n_h, n_single, n_empty)
+    return goal_keys
+
+def retrograde_distances(goal_keys):
+    # breadth first search from all goal boards at once; moves are reversible,
+    # so searching forwards from the goals gives the distance to the nearest goal
+    dist = dict.fromkeys(goal_keys, 0)
+    layer = [(key, empty_pair_of(key)) for key in goal_keys]
+    d = 0
+    while layer:
+        d += 1
+        next_layer = []
+        for key, empty_pair in layer:
+            for succ, succ_pair in successor_keys(key, empty_pair):
+                if succ not in dist:
+                    dist[succ] = d
+                    next_layer.append((succ, succ_pair))
+        layer = next_layer
+    return dist
+
+# header: magic, piece set, bytes per distance, number of boards; the arrays that follow
+# are in native byte order and start 8-byte aligned
+db_magic = b'HRDDB\x00\x00\x01'
+db_header = struct.Struct('<8s3BB4xQ')
+
+def write_distance_db(path, piece_set, dist, magic=db_magic):
+    keys = array('Q', sorted(dist))
+    dists = array('B' if max(dist.values()) < 256 else 'H', [dist[key] for key in keys])
+    with open(path, 'wb') as f:
+        f.write(db_header.pack(magic, *piece_set, dists.itemsize, len(keys)))
+        keys.tofile(f)
+        dists.tofile(f)
+    return len(keys), max(dists)
+
+def build_distance_db(piece_set, path):
+    n_empty = 16 - 2 * piece_set[0] - 2 * piece_set[1] - piece_set[2]
+    if n_empty != 2:
+        raise ValueError('a board needs exactly two empty cells, these pieces leave {}'.format(n_empty))
+    dist = retrograde_distances(enumerate_goal_keys(piece_set))
+    return write_distance_db(path, piece_set, dist)
+
+class DistanceDB:
+    """
+    Read-only view of a distance database written by build_distance_db.
+    The file is memory-mapped, so opening it is cheap and a lookup only pages in
+    the parts of the sorted id array its binary search touches.
+    """
+
+    def __init__(self, path, magic=db_magic):
+        """
+        :param path: The database file.
+        :type path: str
+        :param magic: The kind of database expected in the file.
+        :type magic: bytes
+        """
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        file_magic, n_v, n_h, n_single, dist_size, count = db_header.unpack_from(self.map)
+        if file_magic != magic:
+            self.close()
+            raise ValueError('{} is not a distance database'.format(path))
+        self.piece_set = (n_v, n_h, n_single)
+        self.count = count
+        start = db_header.size
+        view = memoryview(self.map)
+        self.keys = view[start:start + 8 * count].cast('Q')
+        start += 8 * count
+        self.dists = view[start:start + dist_size * count].cast('B' if dist_size == 1 else 'H')
+        view.release()
+
+    def distance(self, key):
+        i = bisect_left(self.keys, key)
+        if i < self.count and self.keys[i] == key:
+            return self.dists[i]
+        return None
+
+    def close(self):
+        for view in (getattr(self, 'keys', None), getattr(self, 'dists', None)):
+            if view is not None:
+                view.release()
+        self.map.close()
+        self.file.close()
+
+def db_solve(board, db, stats=None):
+    # walk down the distance gradient: some neighbour is always exactly one move closer
+    key = hash_board_config(board)
+    if piece_set_of(key) != db.piece_set:
+        raise ValueError('the board pieces {} do not match the database pieces {}'.format(piece_set_of(key), db.piece_set))
+    d = db.distance(key)
+    if d is None:
+        return None
+    curr = State(key, d, 0, None)
+    while d > 0:
+        d -= 1
+        for succ, succ_pair in successor_keys(curr.id, curr.empty_pair):
+            if db.distance(succ) == d:
+                curr = State(succ, curr.f, curr.depth + 1, curr, succ_pair)
+                break
+    if stats is not None:
+        stats.expanded = curr.depth
+    return curr
+
+#-------------------------------------------Below is external memory bfs----------------------------------------------
+# Enumerates every board reachable from a start board without holding them all in memory.
+# Each breadth first layer is a file of sorted packed ids. The children of layer d are
+# collected in a buffer of bounded size, which is sorted and written out as a run whenever
+# it fills; the runs are then merged. Moves are reversible, so a child of layer d can only
+# be in layer d - 1, d or d + 1: duplicates are removed by merging the runs against the
+# layer d and d - 1 files (delayed duplicate detection), and what is left is layer d + 1.
+# At the end all layers are merged into one distance file with the layout of the distance
+# database, so DistanceDB(path, bfs_magic) can look boards up in it.
+# Every file open in a merge holds a chunk in memory and a file descriptor, so no merge
+# reads more than merge_fan_in(buffer_mb) files at once; with more runs, or layers, than
+# that, they are first merged that many at a time into fewer, longer ones.
+
+bfs_magic = b'HRDBFS\x00\x01'
+# a sorted python list costs about this much per id while a run is sorted
+bfs_bytes_per_buffered_key = 64
+bfs_chunk_keys = 1 << 13
+# the most files merged at once, whatever the buffer, to stay well inside the descriptor limit
+bfs_max_fan_in = 64
+
+def merge_fan_in(buffer_mb):
+    return max(2, min(bfs_max_fan_in, int(buffer_mb * 2 ** 20) // (8 * bfs_chunk_keys)))
+
+def read_keys(path, typecode='Q'):
+    # the ids (or distances) of a file, read a chunk at a time
+    with open(path, 'rb') as f:
+        while True:
+            chunk = array(typecode)
+            try:
+                chunk.fromfile(f, bfs_chunk_keys)
+            except EOFError:
+                yield from chunk
+                return
+            yield from chunk
+
+class KeyWriter:
+    # writes ids (or distances) to a file through a fixed size chunk
+    def __init__(self, path, typecode='Q'):
+        self.file = open(path, 'wb')
+        self.typecode = typecode
+        self.chunk = array(typecode)
+        self.count = 0
+
+    def write(self, key):
+        self.chunk.append(key)
+        self.count += 1
+        if len(self.chunk) >= bfs_chunk_keys:
+            self.chunk.tofile(self.file)
+            self.chunk = array(self.typecode)
+
+    def close(self):
+        self.chunk.tofile(self.file)
+        self.file.close()
+
+def write_run(path, buffer):
+    buffer = sorted(buffer)
+    writer = KeyWriter(path)
+    last = None
+    for key in buffer:
+        if key != last:
+            writer.write(key)
+            last = key
+    writer.close()
+
+def reduce_runs(run_paths, fan_in, next_run_path):
+    # merge the runs fan_in at a time until no more than fan_in are left
+    while len(run_paths) > fan_in:
+        merged = []
+        for start in range(0, len(run_paths), fan_in):
+            group = run_paths[start:start + fan_in]
+            if len(group) == 1:
+                merged.extend(group)
+                continue
+            merged.append(next_run_path())
+            writer = KeyWriter(merged[-1])
+            last = None
+            for key in heapq_merge(*[read_keys(path) for path in group]):
+                if key != last:
+                    writer.write(key)
+                    last = key
+            writer.close()
+            for path in group:
+                os.remove(path)
+        run_paths = merged
+    return run_paths
+
+def merge_next_layer(run_paths, layer_paths, out_path):
+    # the sorted union of the runs minus every id in the given layers
+    previous = heapq_merge(*[read_keys(path) for path in layer_paths])
+    seen = next(previous, None)
+    writer = KeyWriter(out_path)
+    last = None
+    for key in heapq_merge(*[read_keys(path) for path in run_paths]):
+        if key == last:
+            continue
+        last = key
+        while seen is not None and seen < key:
+            seen = next(previous, None)
+        if seen != key:
+            writer.write(key)
+    writer.close()
+    return writer.count
+
+def layer_path(workdir, depth):
+    return os.path.join(workdir, 'layer_{:04d}.q'.format(depth))
+
+def external_bfs(init_id, workdir, buffer_mb=64, report=None):
+    """
+    Write the breadth first layers of every board reachable from init_id to workdir.
+
+    :param init_id: The packed id of the start board.
+    :type init_id: int
+    :param workdir: The directory for the layer files and the temporary runs.
+    :type workdir: str
+    :param buffer_mb: Memory in megabytes for the children buffered before a run is written.
+    :type buffer_mb: float
+    :param report: Called with (depth, size) as each layer is finished.
+    :type report: Optional[Callable[[int, int], None]]
+    :return: The size of every layer, starting from the layer of init_id.
+    :rtype: List[int]
+    """
+    buffer_keys = max(1024, int(buffer_mb * 2 ** 20) // bfs_bytes_per_buffered_key)
+    fan_in = merge_fan_in(buffer_mb)
+    runs_written = 0
+
+    def next_run_path():
+        nonlocal runs_written
+        runs_written += 1
+        return os.path.join(workdir, 'run_{:06d}.q'.format(runs_written))
+
+    os.makedirs(workdir, exist_ok=True)
+    writer = KeyWriter(layer_path(workdir, 0))
+    writer.write(init_id)
+    writer.close()
+    sizes = [1]
+    if report is not None:
+        report(0, 1)
+    depth = 0
+    while sizes[-1]:
+        run_paths = []
+        buffer = array('Q')
+        for key in read_keys(layer_path(workdir, depth)):
+            for succ, succ_pair in successor_keys(key, empty_pair_of(key)):
+                buffer.append(succ)
+            if len(buffer) >= buffer_keys:
+                run_paths.append(next_run_path())
+                write_run(run_paths[-1], buffer)
+                buffer = array('Q')
+        if buffer:
+            run_paths.append(next_run_path())
+            write_run(run_paths[-1], buffer)
+        del buffer
+        run_paths = reduce_runs(run_paths, fan_in, next_run_path)
+        layer_paths = [layer_path(workdir, d) for d in (depth - 1, depth) if d >= 0]
+        size = merge_next_layer(run_paths, layer_paths, layer_path(workdir, depth + 1))
+        for path in run_paths:
+            os.remove(path)
+        depth += 1
+        if not size:
+            # the empty last layer is not kept
+            os.remove(layer_path(workdir, depth))
+            break
+        sizes.append(size)
+        if report is not None:
+            report(depth, size)
+    return sizes
+
+def write_distance_file(workdir, sizes, path, piece_set, buffer_mb=64):
+    # merge the layers into one file of sorted ids followed by their distances
+    dist_type = 'B' if len(sizes) <= 256 else 'H'
+    fan_in = merge_fan_in(buffer_mb)
+
+    # a source is a sorted id file and either the distance of all its ids, or a file of them
+    def source_keys(source):
+        keys_path, dists = source
+        if isinstance(dists, int):
+            return ((key, dists) for key in read_keys(keys_path))
+        return zip(read_keys(keys_path), read_keys(dists, dist_type))
+
+    def merged(sources):
+        return heapq_merge(*[source_keys(source) for source in sources])
+
+    sources = [(layer_path(workdir, depth), depth) for depth in range(len(sizes))]
+    temporary = []
+    while len(sources) > fan_in:
+        merged_sources = []
+        for start in range(0, len(sources), fan_in):
+            group = sources[start:start + fan_in]
+            if len(group) == 1:
+                merged_sources.extend(group)
+                continue
+            name = os.path.join(workdir, 'distances_{:04d}'.format(len(temporary)))
+            merged_sources.append((name + '.q', name + '.d'))
+            temporary.extend(merged_sources[-1])
+            keys, dists = KeyWriter(name + '.q'), KeyWriter(name + '.d', dist_type)
+            for key, depth in merged(group):
+                keys.write(key)
+                dists.write(depth)
+            keys.close()
+            dists.close()
+        sources = merged_sources
+
+    with open(path, 'wb') as f:
+        f.write(db_header.pack(bfs_magic, *piece_set, array(dist_type).itemsize, sum(sizes)))
+        chunk = array('Q')
+        for key, depth in merged(sources):
+            chunk.append(key)
+            if len(chunk) >= bfs_chunk_keys:
+                chunk.tofile(f)
+                chunk = array('Q')
+        chunk.tofile(f)
+        chunk = array(dist_type)
+        for key, depth in merged(sources):
+            chunk.append(depth)
+            if len(chunk) >= bfs_chunk_keys:
+                chunk.tofile(f)
+                chunk = array(dist_type)
+        chunk.tofile(f)
+    for name in temporary:
+        os.remove(name)
+
+#-------------------------------------------Below is idastar----------------------------------------------
+# Iterative deepening on f = g + h keeps only the current path in memory. To avoid
+# re-walking the same boards over and over inside an iteration, a fixed-size
+# transposition table remembers the smallest depth each board was reached at; reaching it
+# again no shallower cannot find anything new within the bound. The table is a few flat
+# arrays sized from --tt-mb, so memory use does not grow with the puzzle.
+
+class TranspositionTable:
+    """
+    Fixed-size, direct-mapped table of (board, depth, iteration) entries.
+    When two boards map to the same slot the replacement policy picks the survivor:
+    'always' keeps the newest entry, 'depth' keeps the one reached at the smaller depth
+    (it prunes the larger subtree). Entries of earlier iterations are always replaced.
+    """
+
+    entry_size = 8 + 2 + 2
+
+    def __init__(self, size_mb, policy='depth'):
+        """
+        :param size_mb: Memory for the table in megabytes.
+        :type size_mb: float
+        :param policy: The replacement policy, one of 'depth' or 'always'.
+        :type policy: str
+        """
+        self.size = max(1, int(size_mb * 2 ** 20) // self.entry_size)
+        self.policy = policy
+        self.keys = array('Q', bytes(8 * self.size))
+        self.depths = array('H', bytes(2 * self.size))
+        self.iterations = array('H', bytes(2 * self.size))
+
+    def seen(self, key, depth, iteration):
+        """
+        Record that key was reached at depth, and tell whether it was already reached
+        at no more than that depth during this iteration.
+        """
+        slot = ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) % self.size
+        iteration &= 0xFFFF
+        if self.iterations[slot] == iteration:
+            if self.keys[slot] == key:
+                if self.depths[slot] <= depth:
+                    return True
+                self.depths[slot] = depth
+                return False
+            if self.policy == 'depth' and self.depths[slot] <= depth:
+                return False
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.iterations[slot] = iteration
+        return False
+
+def idastar_iteration(init_id, bound, heuristic, tt, iteration, stats):
+    # depth first search of the boards with f <= bound. Returns the path to the first goal
+    # found, or None and the smallest f that went over the bound.
+    next_bound = None
+    path = [init_id]
+    stack = [successor_keys(init_id, empty_pair_of(init_id))]
+    while stack:
+        depth = len(stack)
+        for succ, succ_pair in stack[-1]:
+            f = depth + heuristic(succ)
+            if f > bound:
+                if next_bound is None or f < next_bound:
+                    next_bound = f
+                continue
+            if tt.seen(succ, depth, iteration):
+                continue
+            path.append(succ)
+            stats.expanded += 1
+            if (succ & goal_mask) == goal_bits:
+                return path, bound
+            stack.append(successor_keys(succ, succ_pair))
+            break
+        else:
+            stack.pop()
+            path.pop()
+    return None, next_bound
+
+def idastar(board, heuristic=key_manhattan_h, tt_mb=64, tt_policy='depth', stats=None):
+    if stats is None:
+        stats = SearchStats()
+    init_id = hash_board_config(board)
+    path = [init_id]
+    if (init_id & goal_mask) != goal_bits:
+        tt = TranspositionTable(tt_mb, tt_policy)
+        bound = heuristic(init_id)
+        iteration = 0
+        while True:
+            iteration += 1
+            path, bound = idastar_iteration(init_id, bound, heuristic, tt, iteration, stats)
+            if path is not None:
+                break
+            if bound is None:
+                return None
+
+    return state_chain(path)
+
+#-------------------------------------------Below is parallel astar----------------------------------------------
+# Hash distributed A* (HDA*): every board has an owner process picked by hashing its id,
+# and only the owner keeps it in an open list and a best-g table. Successors owned by
+# another worker are buffered per owner and sent over in batches through that worker's inbox.
+# Workers keep going on their own, so a board can be expanded with a g that later turns out
+# too big; it is then simply reopened. A goal only sets the incumbent cost, and the search is
+# over once every worker is idle (nothing left below the incumbent) with no batch in flight.
+# The coordinator decides that from the sent/received counters and the idle flags:
+# reading the counters, then the flags, then the counters again, and seeing no change.
+
+hda_batch_size = 256
+hda_expansions_per_poll = 64
+
+def hda_owner(key, n_workers):
+    return (((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 40) % n_workers
+
+def hda_worker(index, n_workers, init_id, heuristic_args, inboxes, requests, replies, shared):
+    incumbent, goal_key, sent, received, idle, done = shared
+    heuristic = make_heuristic(*heuristic_args)
+    inbox = inboxes[index]
+    open_list = []
+    best_g = {}
+    parents = {}
+    outboxes = [[] for i in range(n_workers)]
+    expanded = 0
+
+    def add(key, g, parent, empty_pair):
+        if g < best_g.get(key, g + 1):
+            best_g[key] = g
+            parents[key] = parent
+            f = g + heuristic(key)
+            if f < incumbent.value:
+                heappush(open_list, (f, -g, key, empty_pair))
+
+    def flush(owner):
+        batch = outboxes[owner]
+        outboxes[owner] = []
+        with sent.get_lock():
+            sent.value += len(batch)
+        inboxes[owner].put(batch)
+
+    if hda_owner(init_id, n_workers) == index:
+        add(init_id, 0, None, empty_pair_of(init_id))
+
+    while not done.is_set():
+        # take in the boards other workers sent over; block a little when there is nothing to do
+        wait = not open_list or open_list[0][0] >= incumbent.value
+        while True:
+            try:
+                batch = inbox.get(timeout=0.005) if wait else inbox.get_nowait()
+            except Empty:
+                break
+            idle[index] = 0
+            with received.get_lock():
+                received.value += len(batch)
+            for message in batch:
+                add(*message)
+            wait = False
+
+        for i in range(hda_expansions_per_poll):
+            if not open_list or open_list[0][0] >= incumbent.value:
+                break
+            f, g, key, empty_pair = heappop(open_list)
+            g = -g
+            if g > best_g[key]:
+                continue
+            expanded += 1
+            if (key & goal_mask) == goal_bits:
+                with incumbent.get_lock():
+                    if g < incumbent.value:
+                        incumbent.value = g
+                        goal_key.value = key
+                continue
+            for succ, succ_pair in successor_keys(key, empty_pair):
+                owner = hda_owner(succ, n_workers)
+                if owner == index:
+                    add(succ, g + 1, key, succ_pair)
+                else:
+                    outboxes[owner].append((succ, g + 1, key, succ_pair))
+                    if len(outboxes[owner]) >= hda_batch_size:
+                        flush(owner)
+
+        for owner in range(n_workers):
+            if outboxes[owner]:
+                flush(owner)
+        if not open_list or open_list[0][0] >= incumbent.value:
+            idle[index] = 1
+
+    # the search is over, answer parent lookups for the path until told to stop
+    while True:
+        key = requests.get()
+        if key is None:
+            replies.put(expanded)
+            break
+        replies.put(parents.get(key))
+
+def hda_check_workers(workers):
+    # a worker that died (an exception, out of memory, killed) never goes idle, so stop waiting on it
+    for worker in workers:
+        if worker.exitcode not in (None, 0):
+            raise RuntimeError('hda worker {} stopped with exit code {}'.format(worker.name, worker.exitcode))
+
+def hda_reply(replies, workers):
+    while True:
+        try:
+            return replies.get(timeout=0.1)
+        except Empty:
+            hda_check_workers(workers)
+
+def hda_star(board, heuristic_name='manhattan', pdb_dir='.hrd_pdb', n_workers=None, stats=None):
+    n_workers = n_workers or os.cpu_count()
+    init_id = hash_board_config(board)
+    heuristic_args = (heuristic_name, piece_set_of(init_id), pdb_dir)
+    # load (or build) the pattern databases once here rather than in every worker
+    make_heuristic(*heuristic_args)
+
+    no_solution = 1 << 30
+    incumbent = multiprocessing.Value('i', no_solution)
+    goal_key = multiprocessing.Value('Q', 0, lock=False)
+    sent = multiprocessing.Value('q', 0)
+    received = multiprocessing.Value('q', 0)
+    idle = multiprocessing.Array('b', n_workers, lock=False)
+    done = multiprocessing.Event()
+    shared = (incumbent, goal_key, sent, received, idle, done)
+    inboxes = [multiprocessing.Queue() for i in range(n_workers)]
+    requests = [multiprocessing.Queue() for i in range(n_workers)]
+    replies = [multiprocessing.Queue() for i in range(n_workers)]
+    workers = [multiprocessing.Process(target=hda_worker,
+                   args=(i, n_workers, init_id, heuristic_args, inboxes, requests[i], replies[i], shared),
+                   daemon=True)
+               for i in range(n_workers)]
+    for worker in workers:
+        worker.start()
+
+    try:
+        while True:
+            time.sleep(0.002)
+            hda_check_workers(workers)
+            sent_before, received_before = sent.value, received.value
+            if sent_before != received_before or not all(idle):
+                continue
+            if (sent.value, received.value) == (sent_before, received_before):
+                break
+        done.set()
+
+        path = []
+        if incumbent.value != no_solution:
+            key = goal_key.value
+            while key is not None:
+                path.append(key)
+                owner = hda_owner(key, n_workers)
+                requests[owner].put(key)
+                key = hda_reply(replies[owner], workers)
+            path.reverse()
+        for i in range(n_workers):
+            requests[i].put(None)
+        expanded = sum(hda_reply(replies[i], workers) for i in range(n_workers))
+    except BaseException:
+        # the others may be waiting on the dead worker, or on requests that will not come
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        done.set()
+        for worker in workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.terminate()
+
+    if stats is not None:
+        stats.expanded = expanded
+    if not path:
+        return None
+    return state_chain(path)
+
+#-------------------------------------------Below is bidirectional bfs----------------------------------------------
+# The goal is a set of boards rather than one, but with a fixed piece set that set is easy to
+# list (enumerate_goal_keys), so a second breadth first search can grow backwards from all of
+# them at once. Each step expands a whole layer of the smaller side, and the search stops at
+# the end of the first layer in which the two sides meet.
+
+def expand_layer(layer, seen, other_seen, depth):
+    # seen maps a board to (parent board, depth); returns the next layer
+    # and the boards in it the other side has already seen
+    next_layer = []
+    meets = []
+    for key, empty_pair in layer:
+        for succ, succ_pair in successor_keys(key, empty_pair):
+            if succ not in seen:
+                seen[succ] = (key, depth)
+                next_layer.append((succ, succ_pair))
+                if succ in other_seen:
+                    meets.append(succ)
+    return next_layer, meets
+
+def bibfs(board, stats=None):
+    init_id = hash_board_config(board)
+    goal_keys = enumerate_goal_keys(piece_set_of(init_id))
+
+    # parents point towards the initial board going forwards, towards a goal going backwards
+    forward_seen = {init_id: (None, 0)}
+    backward_seen = dict.fromkeys(goal_keys, (None, 0))
+    forward_layer = [(init_id, empty_pair_of(init_id))]
+    backward_layer = [(key, empty_pair_of(key)) for key in goal_keys]
+    forward_depth = backward_depth = 0
+    meets = [init_id] if init_id in backward_seen else []
+    expanded = 0
+    while forward_layer and backward_layer and not meets:
+        expanded += min(len(forward_layer), len(backward_layer))
+        if len(forward_layer) <= len(backward_layer):
+            forward_depth += 1
+            forward_layer, meets = expand_layer(forward_layer, forward_seen, backward_seen, forward_depth)
+        else:
+            backward_depth += 1
+            backward_layer, meets = expand_layer(backward_layer, backward_seen, forward_seen, backward_depth)
+    if stats is not None:
+        stats.expanded = expanded
+        stats.peak_closed = len(forward_seen) + len(backward_seen)
+    if not meets:
+        return None
+
+    # every board met in the last layer closes a path; keep the shortest
+    meet = min(meets, key=lambda key: forward_seen[key][1] + backward_seen[key][1])
+    path = []
+    key = meet
+    while key is not None:
+        path.append(key)
+        key = forward_seen[key][0]
+    path.reverse()
+    key = backward_seen[meet][0]
+    while key is not None:
+        path.append(key)
+        key = backward_seen[key][0]
+
+    return state_chain(path)
+
+#-------------------------------------------Below is layer synchronous bfs----------------------------------------------
+# Every move costs one, so a breadth first search finds a shortest solution with no heuristic
+# at all. bfs keeps each layer as a sorted NumPy array of packed ids and expands a whole layer
+# at once. The possible moves (blank_moves, whose masks check both the piece and the cells
+# it moves into) are grouped by mask: one vectorised AND per group, then for each move in it
+# one compare picks the boards it applies to and one XOR makes their children. np.unique sorts and dedupes the children, and a sorted search drops the ones
+# in the current or previous layer; moves are reversible, so a child can be in no other.
+# NumPy is only needed by this algorithm and the state graph, and is imported when they run.
+
+def import_numpy(feature):
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError('{} needs numpy, which is not installed'.format(feature))
+    return numpy
+
+def key_move_groups(np):
+    # blank_moves as [(mask, [(bits, delta), ...]), ...] in NumPy integers, grouped by mask
+    move_groups = {}
+    for cell_moves in blank_moves:
+        for mask, bits, delta in cell_moves:
+            move_groups.setdefault(mask, []).append((np.uint64(bits), np.uint64(delta)))
+    return [(np.uint64(mask), moves) for mask, moves in move_groups.items()]
+
+def layer_children(np, layer, move_groups):
+    # every child of every board in layer, unsorted and with repeats
+    children = []
+    for mask, moves in move_groups:
+        masked = layer & mask
+        children.extend(layer[masked == bits] ^ delta for bits, delta in moves)
+    return np.concatenate(children)
+
+def sorted_contains(np, sorted_keys, keys):
+    # for each of keys, whether it is in the sorted array sorted_keys
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(sorted_keys, keys)
+    positions[positions == len(sorted_keys)] = 0
+    return sorted_keys[positions] == keys
+
+def bfs(board, stats=None):
+    np = import_numpy('--algo bfs')
+    move_groups = key_move_groups(np)
+    layer_goal_mask, layer_goal_bits = np.uint64(goal_mask), np.uint64(goal_bits)
+    layers = [np.array([hash_board_config(board)], dtype=np.uint64)]
+    generated = expanded = 0
+    goal = None
+    while True:
+        layer = layers[-1]
+        at_goal = layer[(layer & layer_goal_mask) == layer_goal_bits]
+        if len(at_goal):
+            goal = int(at_goal[0])
+            break
+        children = layer_children(np, layer, move_groups)
+        expanded += len(layer)
+        generated += len(children)
+        children = np.unique(children)
+        for previous in layers[-2:]:
+            children = children[~sorted_contains(np, previous, children)]
+        if not len(children):
+            break
+        layers.append(children)
+
+    if stats is not None:
+        stats.generated = generated
+        stats.expanded = expanded
+        stats.peak_frontier = max(len(layer) for layer in layers)
+        stats.peak_closed = sum(len(layer) for layer in layers)
+    if goal is None:
+        return None
+
+    # walk back from the goal: a parent of a board in layer d is a neighbour of it in layer d - 1
+    path = [goal]
+    for depth in range(len(layers) - 2, -1, -1):
+        key = path[-1]
+        for succ, succ_pair in successor_keys(key, empty_pair_of(key)):
+            if sorted_contains(np, layers[depth], np.array([succ], dtype=np.uint64))[0]:
+                path.append(succ)
+                break
+    path.reverse()
+    return state_chain(path)
+
+#-------------------------------------------Below is the state graph----------------------------------------------
+# For questions about boards other than the goal (how far apart are two boards, what is around
+# a board) the whole reachable state graph is built once, offline, and saved in a directory as
+# three NumPy arrays: keys.npy, the sorted packed ids, so the rank of an id is its index;
+# and the adjacency in compressed sparse row form, offsets.npy and neighbours.npy, where the
+# neighbours of index i are neighbours[offsets[i]:offsets[i + 1]]. StateGraph memory-maps
+# the arrays and searches on indexes alone, a whole layer at a time, without building boards.
+
+graph_files = ('keys.npy', 'offsets.npy', 'neighbours.npy')
+
+def build_state_graph(seed_keys, outdir, report=None):
+    """
+    Enumerate every board reachable from seed_keys and write the state graph to outdir.
+
+    :param seed_keys: The packed ids the search starts from.
+    :type seed_keys: List[int]
+    :param outdir: The directory for the graph arrays, created if missing.
+    :type outdir: str
+    :param report: Called with the depth and size of each layer as it is found.
+    :type report: Callable[[int, int], None]
+    :return: The number of boards and the number of moves between them.
+    :rtype: Tuple[int, int]
+    """
+    np = import_numpy('the state graph')
+    move_groups = key_move_groups(np)
+    layers = [np.unique(np.array(seed_keys, dtype=np.uint64))]
+    while len(layers[-1]):
+        if report is not None:
+            report(len(layers) - 1, len(layers[-1]))
+        children = np.unique(layer_children(np, layers[-1], move_groups))
+        for previous in layers[-2:]:
+            children = children[~sorted_contains(np, previous, children)]
+        layers.append(children)
+    keys = np.sort(np.concatenate(layers))
+
+    # every move of every board, as (source index, target index) pairs sorted by source
+    sources, targets = [], []
+    for mask, moves in move_groups:
+        masked = keys & mask
+        for bits, delta in moves:
+            source = np.flatnonzero(masked == bits)
+            sources.append(source)
+            targets.append(np.searchsorted(keys, keys[source] ^ delta))
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    neighbours = targets[np.argsort(sources, kind='stable')].astype(np.uint32)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(keys)), out=offsets[1:])
+
+    os.makedirs(outdir, exist_ok=True)
+    for name, values in zip(graph_files, (keys, offsets, neighbours)):
+        np.save(os.path.join(outdir, name), values)
+    return len(keys), len(neighbours) // 2
+
+class StateGraph:
+    """
+    Read-only view of a state graph written by build_state_graph.
+    The arrays are memory-mapped, so opening a graph is cheap and a query only pages in
+    the parts of the arrays it touches. Boards are passed and returned as packed ids.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The directory the graph was written to.
+        :type path: str
+        """
+        self.np = import_numpy('the state graph')
+        self.keys, self.offsets, self.neighbours = (
+            self.np.load(os.path.join(path, name), mmap_mode='r') for name in graph_files)
+        self.count = len(self.keys)
+
+    def index(self, key):
+        i = int(self.np.searchsorted(self.keys, self.np.uint64(key)))
+        if i < self.count and self.keys[i] == key:
+            return i
+        raise KeyError('board {:#x} is not in the state graph'.format(key))
+
+    def key(self, index):
+        return int(self.keys[index])
+
+    def neighbour_keys(self, key):
+        i = self.index(key)
+        return [int(k) for k in self.keys[self.neighbours[self.offsets[i]:self.offsets[i + 1]]]]
+
+    def expand(self, frontier):
+        # the neighbours of every index in frontier, and for each the index it came from
+        np = self.np
+        starts = self.offsets[frontier]
+        counts = self.offsets[frontier + 1] - starts
+        firsts = np.cumsum(counts) - counts
+        positions = np.arange(counts.sum()) + np.repeat(starts - firsts, counts)
+        return np.repeat(frontier, counts), self.neighbours[positions].astype(np.int64)
+
+    def neighbourhood(self, key, radius):
+        """
+        List every board at most radius moves from key.
+
+        :param key: The packed id of the centre board.
+        :type key: int
+        :param radius: The largest distance to include.
+        :type radius: int
+        :return: The packed ids of the boards and their distances from key, nearest first.
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        np = self.np
+        seen = np.zeros(self.count, dtype=bool)
+        layer = np.array([self.index(key)], dtype=np.int64)
+        seen[layer] = True
+        layers = [layer]
+        while len(layers) <= radius and len(layer):
+            layer = np.unique(self.expand(layer)[1])
+            layer = layer[~seen[layer]]
+            seen[layer] = True
+            layers.append(layer)
+        indexes = np.concatenate(layers)
+        distances = np.repeat(np.arange(len(layers)), [len(layer) for layer in layers])
+        return self.keys[indexes], distances
+
+    def shortest_path(self, start, goal):
+        """
+        Find a shortest sequence of moves between two boards with a bidirectional breadth first search.
+
+        :param start: The packed id of the first board.
+        :type start: int
+        :param goal: The packed id of the last board.
+        :type goal: int
+        :return: The packed ids of the boards on the path, start and goal included, or None if
+            goal cannot be reached from start.
+        :rtype: List[int]
+        """
+        np = self.np
+        ends = (self.index(start), self.index(goal))
+        # per side, the distance of each index from that side's end (-1: not seen) and its parent
+        dists = [np.full(self.count, -1, dtype=np.int32) for side in ends]
+        parents = [np.full(self.count, -1, dtype=np.int64) for side in ends]
+        frontiers = []
+        for side, end in enumerate(ends):
+            dists[side][end] = 0
+            frontiers.append(np.array([end], dtype=np.int64))
+        meet = ends[0] if ends[0] == ends[1] else None
+        depths = [0, 0]
+        while meet is None and len(frontiers[0]) and len(frontiers[1]):
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            froms, layer = self.expand(frontiers[side])
+            new = dists[side][layer] < 0
+            layer, first = np.unique(layer[new], return_index=True)
+            depths[side] += 1
+            dists[side][layer] = depths[side]
+            parents[side][layer] = froms[new][first]
+            # the whole layer is in, so the meeting board nearest the other end gives a shortest path
+            other = dists[1 - side][layer]
+            if (other >= 0).any():
+                meet = int(layer[np.argmin(np.where(other >= 0, other, np.iinfo(np.int32).max))])
+            frontiers[side] = layer
+
+        if meet is None:
+            return None
+        path = []
+        i = meet
+        while i >= 0:
+            path.append(i)
+            i = int(parents[0][i])
+        path.reverse()
+        i = int(parents[1][meet])
+        while i >= 0:
+            path.append(i)
+            i = int(parents[1][i])
+        return [self.key(i) for i in path]
+
+    def distance(self, start, goal):
+        path = self.shortest_path(start, goal)
+        return None if path is None else len(path) - 1
+
+#-------------------------------------------Below is optimal solution counting----------------------------------------------
+# Every shortest solution steps from layer d of a breadth first search to layer d + 1, so together
+# they form a DAG over the layers up to the first one holding a goal board. Walking the layers
+# back from there, each board gets the number of shortest solutions through it: one for a goal
+# board, otherwise the sum over its children in the next layer; boards with none are not on the
+# DAG and are dropped. Python ints do not overflow, however many solutions there are. The edges
+# are not stored, the move table finds them again, so listing or sampling the solutions is a
+# walk down the counts and never searches again.
+
+class OptimalSolutions:
+    """
+    All shortest solutions of a board: counted when created, then listed or sampled on demand.
+    Solutions are lists of packed ids from the initial board to a goal board.
+    """
+
+    def __init__(self, board, stats=None):
+        """
+        :param board: The initial board.
+        :type board: Board
+        :param stats: If given, filled with the counters of the breadth first search.
+        :type stats: SearchStats
+        """
+        self.init_id = hash_board_config(board)
+        layers = [[self.init_id]]
+        previous, current = set(), {self.init_id}
+        generated = 0
+        goals = []
+        while layers[-1]:
+            goals = [key for key in layers[-1] if key & goal_mask == goal_bits]
+            if goals:
+                break
+            following = set()
+            for key in layers[-1]:
+                for succ, succ_pair in successor_keys(key, empty_pair_of(key)):
+                    generated += 1
+                    if succ not in current and succ not in previous:
+                        following.add(succ)
+            layers.append(list(following))
+            previous, current = current, following
+        if stats is not None:
+            stats.generated = generated
+            stats.expanded = sum(len(layer) for layer in layers[:-1])
+            stats.peak_frontier = max(len(layer) for layer in layers)
+            stats.peak_closed = stats.expanded + len(layers[-1])
+
+        # ways[d] maps each board of layer d on the DAG to its number of shortest solutions
+        self.length = len(layers) - 1 if goals else None
+        self.ways = [dict.fromkeys(goals, 1)]
+        for layer in reversed(layers[:-1] if goals else []):
+            below = self.ways[-1]
+            ways = {}
+            for key in layer:
+                count = sum(below.get(succ, 0) for succ, succ_pair in successor_keys(key, empty_pair_of(key)))
+                if count:
+                    ways[key] = count
+            self.ways.append(ways)
+        self.ways.reverse()
+        self.count = self.ways[0].get(self.init_id, 0)
+
+    def next_boards(self, key, depth):
+        # the children of key, at the given depth, that are on the DAG
+        below = self.ways[depth + 1]
+        for succ, succ_pair in successor_keys(key, empty_pair_of(key)):
+            if succ in below:
+                yield succ
+
+    def __iter__(self):
+        # every shortest solution, one at a time, depth first
+        if not self.count:
+            return
+        path = [self.init_id]
+        pending = [self.next_boards(self.init_id, 0)]
+        if self.length == 0:
+            yield list(path)
+            return
+        while pending:
+            succ = next(pending[-1], None)
+            if succ is None:
+                pending.pop()
+                path.pop()
+            elif len(path) == self.length:
+                yield path + [succ]
             else:
-                add_curr_succ_to_frontier_astar(curr, frontier)
+                path.append(succ)
+                pending.append(self.next_boards(succ, len(path) - 1))
+
+    def sample(self, rng=random):
+        """
+        Draw a shortest solution uniformly at random: each child is taken with probability
+        proportional to the number of shortest solutions through it.
+
+        :param rng: The random number generator to draw with.
+        :type rng: random.Random
+        :return: The packed ids of the solution, or None if there is none.
+        :rtype: List[int]
+        """
+        if not self.count:
+            return None
+        path = [self.init_id]
+        for depth in range(self.length):
+            r = rng.randrange(self.ways[depth][path[-1]])
+            for succ in self.next_boards(path[-1], depth):
+                r -= self.ways[depth + 1][succ]
+                if r < 0:
+                    path.append(succ)
+                    break
+        return path
+
+#-------------------------------------------Below is the portfolio----------------------------------------------
+# Which algorithm finishes first depends on the board, so the portfolio runs several of them
+# (engines) at once, each in its own process, and takes the first answer good enough for the
+# requested quality: 'any' solution, or an 'optimal' one. Engines that can never give an
+# optimal solution (dfs) are not started when one is asked for, and an arastar or weighted
+# astar answer only counts as optimal when its bound is 1. "No solution" is only taken from an
+# engine that explored every board, which dfs with a Bloom filter cannot promise. The other
+# engines are stopped as soon as there is an answer: SIGTERM raises SearchTimeout inside
+# them, so they unwind through their finally blocks (hda stops its own workers there). When
+# no engine gives an answer that can be taken, their errors are raised together.
+
+optimal_algorithms = {'astar', 'arastar', 'bfs', 'bibfs', 'db', 'hda', 'idastar'}
+
+def portfolio_engine(engine, board, args, results):
+    # one engine of the portfolio: solve and put (engine, path or None, stats) on results
+    signal.signal(signal.SIGTERM, raise_search_timeout)
+    stats = SearchStats()
+    try:
+        reach_goal = run_search(board, argparse.Namespace(**dict(vars(args), algo=engine)), stats)
+    except SearchTimeout:
+        return
+    except Exception as e:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        results.put((engine, 'error: {}'.format(e), None, None))
+        return
+    # the search is over; from here on a stop request just ends the process
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    path = []
+    while reach_goal is not None:
+        path.append(reach_goal.id)
+        reach_goal = reach_goal.parent
+    path.reverse()
+    results.put((engine, 'ok' if path else 'no solution', path, stats.as_dict()))
+
+def portfolio(board, args, stats=None):
+    """
+    Race the engines in args.engines and return the first answer of args.quality.
+
+    :param board: The initial board.
+    :type board: Board
+    :param args: The solver options; args.engines is a comma separated list of algorithms.
+    :type args: argparse.Namespace
+    :param stats: Filled in with the counters of the winning engine, and which one it was.
+    :type stats: Optional[SearchStats]
+    :return: The goal state of the answer, or None if there is no solution.
+    :rtype: Optional[State]
+    :raises RuntimeError: When no engine gave an answer that can be taken.
+    """
+    if stats is None:
+        stats = SearchStats()
+    engines = [engine for engine in args.engines.split(',')
+               if args.quality == 'any' or engine in optimal_algorithms]
+    if not engines:
+        raise ValueError('none of the engines {} can give an {} solution'.format(args.engines, args.quality))
+    results = multiprocessing.Queue()
+    # not daemons: a daemon process cannot start the workers of an hda engine
+    processes = [multiprocessing.Process(target=portfolio_engine, args=(engine, board, args, results))
+                 for engine in engines]
+    for process in processes:
+        process.start()
+    path = None
+    winner = None
+    # why each answer that came in was not taken
+    rejected = []
+    try:
+        answered = 0
+        while answered < len(engines):
+            try:
+                engine, status, engine_path, engine_stats = results.get(timeout=0.1)
+            except Empty:
+                # an engine killed from outside never answers
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    rejected.append('{} engine(s) stopped without an answer'.format(len(engines) - answered))
+                    break
+                continue
+            answered += 1
+            if status == 'no solution' and engine == 'dfs' and args.closed == 'bloom':
+                rejected.append('dfs: no solution, but its Bloom filter may have skipped boards')
+                continue
+            if status != 'ok' and status != 'no solution':
+                rejected.append('{}: {}'.format(engine, status))
+                continue
+            if args.quality == 'optimal' and engine_stats['bound'] not in (None, 1):
+                rejected.append('{}: a solution up to {:g} times the shortest'.format(engine, engine_stats['bound']))
+                continue
+            # an exact no solution from one engine means there is none, whatever the others say
+            path = engine_path
+            for name, value in engine_stats.items():
+                if name != 'branching_factor':
+                    setattr(stats, name, value)
+            stats.winner = winner = engine
+            break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        results.close()
+    if winner is None:
+        raise RuntimeError('no engine gave an answer: {}'.format('; '.join(rejected)))
+    if not path:
+        return None
+    return state_chain(path)
+
+#-------------------------------------------Below is the pattern database heuristic----------------------------------------------
+# Two abstractions of the board, each one keeping only some of the pieces:
+#   the goal piece plus the 1x2 pieces, with the 1x1 pieces taken off the board, and
+#   the 1x1 pieces alone, whose goal is to leave the 2x2 goal area free.
+# Every real move moves a piece of exactly one of the two, and is still a legal move there
+# since taking pieces away only frees cells. So the exact abstract distances add up to an
+# admissible heuristic, and as a move changes only one of them by at most one, a consistent one.
+# Both tables are small, are built once per piece set and kept on disk next to each other.
+
+pdb_magic = b'HRDPDB\x00\x01'
+# heuristic value of boards whose abstraction cannot reach the goal at all
+dead_end_h = 999
+
+def single_cells(key):
+    # the 1x1 code is 0b010: bit 1 set, bits 0 and 2 clear. One bit per 1x1 piece, at bit 1 of its cell.
+    return (key & ~(key << 1) & ~(key >> 1)) & (cell_low_bits << 1)
+
+def build_blank_move_table():
+    # Move generation for abstract boards, which have any number of empty cells.
+    # blank_moves[cell] lists (mask, bits, delta) of the moves that need the empty cell `cell`,
+    # filed under the lowest cell they need so that each move is listed once.
+    table = [[] for cell in range(20)]
+    for (shape, y, x, d), delta in move_deltas.items():
+        dy, dx = move_offsets[d]
+        old_cells = piece_cell_set(shape, y, x)
+        new_cells = piece_cell_set(shape, y + dy, x + dx)
+        mask = sum(cell_mask << (cell_bits * c) for c in old_cells | new_cells)
+        table[min(new_cells - old_cells)].append((mask, piece_bits(shape, y, x), delta))
+    return table
+
+blank_moves = build_blank_move_table()
+
+def abstract_successor_keys(key):
+    empty = ~(key | key >> 1 | key >> 2) & cell_low_bits
+    while empty:
+        low = empty & -empty
+        empty ^= low
+        for mask, bits, delta in blank_moves[(low.bit_length() - 1) // cell_bits]:
+            if key & mask == bits:
+                yield key ^ delta
+
+def pattern_distances(goal_keys):
+    dist = dict.fromkeys(goal_keys, 0)
+    layer = list(goal_keys)
+    d = 0
+    while layer:
+        d += 1
+        next_layer = []
+        for key in layer:
+            for succ in abstract_successor_keys(key):
+                if succ not in dist:
+                    dist[succ] = d
+                    next_layer.append(succ)
+        layer = next_layer
+    return dist
+
+def single_goal_keys(n_single):
+    goal_area = piece_cell_set('1', 3, 1)
+    free_cells = [cell for cell in range(20) if cell not in goal_area]
+    return [sum(code_of[char_single] << (cell_bits * c) for c in cells)
+            for cells in combinations(free_cells, n_single)]
+
+def load_pattern_db(path, piece_set, build_goal_keys):
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # write to a temporary name first so that a concurrent reader never sees half a file
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        write_distance_db(tmp_path, piece_set, pattern_distances(build_goal_keys()), pdb_magic)
+        os.replace(tmp_path, path)
+    db = DistanceDB(path, pdb_magic)
+    table = dict(zip(db.keys, db.dists))
+    db.close()
+    return table
+
+def pdb_heuristic(piece_set, pdb_dir):
+    """
+    Make the additive pattern database heuristic for boards with the given pieces.
+
+    :param piece_set: (vertical 1x2, horizontal 1x2, 1x1) piece counts.
+    :type piece_set: Tuple[int, int, int]
+    :param pdb_dir: Where the pattern databases are cached.
+    :type pdb_dir: str
+    :return: A function from a packed board id to its heuristic value.
+    :rtype: Callable[[int], int]
+    """
+    n_v, n_h, n_single = piece_set
+    pieces_path = os.path.join(pdb_dir, 'pdb-v{}h{}.bin'.format(n_v, n_h))
+    singles_path = os.path.join(pdb_dir, 'pdb-s{}.bin'.format(n_single))
+    pieces_h = load_pattern_db(pieces_path, (n_v, n_h, 0), lambda: enumerate_goal_keys((n_v, n_h, 0)))
+    singles_h = load_pattern_db(singles_path, (0, 0, n_single), lambda: single_goal_keys(n_single))
+
+    def heuristic(key):
+        singles = single_cells(key)
+        return pieces_h.get(key ^ singles, dead_end_h) + singles_h.get(singles, dead_end_h)
+    return heuristic
+
+#-------------------------------------------Below is the solution cache----------------------------------------------
+# With --cache, solutions are kept in an sqlite file between runs, keyed by the canonical id
+# of the initial board (a board and its mirror image share an entry) and the search: the
+# algorithm plus the options that can change its answer (see cache_signature). Only exact
+# answers are stored, so settings that may give a longer solution, or wrongly none, such as
+# a weight above 1 or a Bloom filter, are not cached. A solution is stored as the packed ids
+# of its boards, in the orientation of the canonical board, and mirrored back on the way out
+# when the board asked for is the mirror image; NULL stands for a board with no solution.
+# Entries are stamped when stored and, at most once every cache_touch_seconds, when found,
+# so lookups rarely write; the least recently used are dropped beyond the cap. The hit and
+# lookup counters are kept in the file too, for a hit rate across runs, but are only written
+# with a store or when the process exits, not on every lookup.
+
+cache_version = 3
+cache_touch_seconds = 3600
+
+# the options, besides the algorithm, that can change the answer it gives
+cache_options = {
+    'dfs': ('symmetry',),
+    'astar': ('symmetry', 'heuristic', 'frontier'),
+    'arastar': ('heuristic', 'weight'),
+    'idastar': ('heuristic', 'tt_mb', 'tt_policy'),
+    'hda': ('heuristic',),
+    'portfolio': ('engines', 'quality'),
+}
+
+def cache_signature(args):
+    """
+    The cache key of the search args asks for, or None when its answer must not be cached.
+
+    :param args: The solver options, as added by add_solver_arguments.
+    :type args: argparse.Namespace
+    :rtype: Optional[str]
+    """
+    if args.algo == 'dfs' and args.closed == 'bloom':
+        return None
+    if args.algo == 'astar' and (args.weight or 1) > 1:
+        return None
+    if args.algo == 'portfolio' and args.quality == 'any':
+        return None
+    options = dict(vars(args))
+    options['weight'] = args.weight or arastar_weight
+    options['engines'] = ','.join(sorted(args.engines.split(',')))
+    return ' '.join([args.algo] + ['{}={}'.format(name, options[name]) for name in cache_options.get(args.algo, ())])
+
+class SolutionCache:
+    """
+    Persistent cache of solutions in an sqlite file.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        """
+        :param path: The sqlite file, created if missing.
+        :type path: str
+        :param max_entries: Solutions kept before the least recently used are evicted.
+        :type max_entries: int
+        """
+        self.max_entries = max_entries
+        # lookups by this process not yet added to the counters in the file
+        self.hits = 0
+        self.lookups = 0
+        self.db = sqlite3.connect(path, timeout=60)
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != cache_version:
+            # a new file, or one written with an older layout: start it over
+            with self.db:
+                self.db.execute('DROP TABLE IF EXISTS solutions')
+                self.db.execute('DROP TABLE IF EXISTS counters')
+                self.db.execute('CREATE TABLE solutions (board INTEGER, search TEXT, path BLOB, '
+                                'last_used REAL, PRIMARY KEY (board, search))')
+                self.db.execute('CREATE INDEX solutions_last_used ON solutions (last_used)')
+                self.db.execute('CREATE TABLE counters (name TEXT PRIMARY KEY, value INTEGER)')
+                self.db.execute("INSERT INTO counters VALUES ('hits', 0), ('lookups', 0)")
+                self.db.execute('PRAGMA user_version = {}'.format(cache_version))
+        # also run at the exit of a pool worker, which skips atexit
+        multiprocessing.util.Finalize(self, self.flush, exitpriority=10)
+
+    def lookup(self, init_id, search):
+        """
+        Find the stored solution for a board.
+
+        :param init_id: The packed id of the initial board.
+        :type init_id: int
+        :param search: The search the solution is for, from cache_signature.
+        :type search: str
+        :return: (found, goal state or None when the board has no solution)
+        :rtype: Tuple[bool, Optional[State]]
+        """
+        board = canonical_key(init_id)
+        row = self.db.execute('SELECT path, last_used FROM solutions WHERE board = ? AND search = ?',
+                              (board, search)).fetchone()
+        self.lookups += 1
+        if row is None:
+            return False, None
+        self.hits += 1
+        now = time.time()
+        if now - row[1] > cache_touch_seconds:
+            with self.db:
+                self.db.execute('UPDATE solutions SET last_used = ? WHERE board = ? AND search = ?',
+                                (now, board, search))
+        if row[0] is None:
+            return True, None
+        path = array('Q', row[0])
+        if board != init_id:
+            path = [mirror_key(key) for key in path]
+        return True, state_chain(path)
+
+    def store(self, init_id, search, reach_goal):
+        board = canonical_key(init_id)
+        path = None
+        if reach_goal is not None:
+            keys = array('Q', [0] * (reach_goal.depth + 1))
+            curr = reach_goal
+            while curr is not None:
+                keys[curr.depth] = curr.id if board == init_id else mirror_key(curr.id)
+                curr = curr.parent
+            path = keys.tobytes()
+        with self.db:
+            self.flush_counters()
+            self.db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)', (board, search, path, time.time()))
+            count = self.db.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+            if count > self.max_entries:
+                self.db.execute('DELETE FROM solutions WHERE rowid IN '
+                                '(SELECT rowid FROM solutions ORDER BY last_used LIMIT ?)', (count - self.max_entries,))
+
+    def flush_counters(self):
+        # add this process's lookups to the counters in the file, inside the caller's transaction
+        if self.lookups:
+            self.db.execute("UPDATE counters SET value = value + ? WHERE name = 'hits'", (self.hits,))
+            self.db.execute("UPDATE counters SET value = value + ? WHERE name = 'lookups'", (self.lookups,))
+            self.hits = self.lookups = 0
+
+    def flush(self):
+        if self.lookups:
+            with self.db:
+                self.flush_counters()
+
+    def hit_rate(self):
+        # over every lookup made with this file, the ones of this process included
+        counters = dict(self.db.execute('SELECT name, value FROM counters'))
+        hits, lookups = counters['hits'] + self.hits, counters['lookups'] + self.lookups
+        return hits / lookups if lookups else 0.0
+
+# caches already opened by this process, by (path, cap)
+open_caches = {}
+
+def solution_cache(args):
+    if args.cache is None or args.no_cache:
+        return None
+    if (args.cache, args.cache_size) not in open_caches:
+        open_caches[(args.cache, args.cache_size)] = SolutionCache(args.cache, args.cache_size)
+    return open_caches[(args.cache, args.cache_size)]
+
+#-------------------------------------------Below is the command line----------------------------------------------
+
+algorithms = ['astar', 'dfs', 'db', 'bibfs', 'idastar', 'hda', 'arastar', 'bfs', 'portfolio']
+
+def add_solver_arguments(parser, algo_required=False):
+    parser.add_argument(
+        "--algo",
+        type=str,
+        required=algo_required,
+        default=None if algo_required else 'astar',
+        choices=algorithms,
+        help="The searching algorithm."
+    )
+    parser.add_argument(
+        "--symmetry",
+        action="store_true",
+        help="Treat a board and its left-right mirror image as the same explored state."
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        help="The distance database used by --algo db (see build-db)."
+    )
+    parser.add_argument(
+        "--heuristic",
+        type=str,
+        default='manhattan',
+        choices=['manhattan', 'pdb'],
+        help="The heuristic used by astar, arastar and idastar."
+    )
+    parser.add_argument(
+        "--pdb-dir",
+        type=str,
+        default='.hrd_pdb',
+        help="Where the pattern databases for --heuristic pdb are cached."
+    )
+    parser.add_argument(
+        "--weight",
+        type=float,
+        default=None,
+        help="Weighted astar with f = g + WEIGHT * h, at most WEIGHT times the shortest solution; "
+             "for arastar the weight of the first iteration (3 by default)."
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=None,
+        help="Seconds arastar may keep improving its solution for."
+    )
+    parser.add_argument(
+        "--engines",
+        type=str,
+        default='astar,dfs,bibfs',
+        help="Comma separated algorithms --algo portfolio races against each other."
+    )
+    parser.add_argument(
+        "--quality",
+        type=str,
+        default='any',
+        choices=['any', 'optimal'],
+        help="Whether --algo portfolio takes any solution or only a shortest one."
+    )
+    parser.add_argument(
+        "--frontier",
+        type=str,
+        default='heap',
+        choices=['heap', 'buckets'],
+        help="The astar open list: a binary heap, or one bucket per f value."
+    )
+    parser.add_argument(
+        "--closed",
+        type=str,
+        default='set',
+        choices=['set', 'table', 'bloom'],
+        help="How dfs and astar remember explored boards: a python set, a compact hash table, "
+             "or (dfs only) a Bloom filter that may wrongly skip a few boards."
+    )
+    parser.add_argument(
+        "--bloom-mb",
+        type=float,
+        default=16,
+        help="Memory in megabytes for the --closed bloom filter."
+    )
+    parser.add_argument(
+        "--tt-mb",
+        type=float,
+        default=64,
+        help="Memory in megabytes for the idastar transposition table."
+    )
+    parser.add_argument(
+        "--tt-policy",
+        type=str,
+        default='depth',
+        choices=['depth', 'always'],
+        help="Which entry the idastar transposition table keeps when two boards collide."
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default='grid',
+        choices=['grid', 'moves'],
+        help="Write every board of the solution, or the initial board and one line per move."
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="count",
+        default=0,
+        help="-v prints the search counters, -vv also prints every board dfs and astar expand."
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="An sqlite file to cache solutions in between runs, such as .hrd_cache.sqlite; "
+             "no cache unless given."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither look up nor store solutions, even with --cache."
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=10000,
+        help="Solutions kept in the cache before the least recently used are evicted."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes for --algo hda, one per CPU by default."
+    )
+
+def solver_argument_error(args, algos):
+    # what is wrong with the solver options for running algos, or None
+    if 'portfolio' in algos:
+        engines = args.engines.split(',')
+        for engine in engines:
+            if engine not in algorithms or engine == 'portfolio':
+                return "--engines cannot include {}".format(engine)
+        algos = algos + engines
+        if args.quality == 'optimal' and not optimal_algorithms.intersection(engines):
+            return "none of --engines can give an optimal solution"
+    if 'db' in algos and args.db is None:
+        return "--algo db needs --db"
+    if 'astar' in algos and args.closed == 'bloom':
+        return "--closed bloom only works with dfs"
+    if args.weight is not None and args.weight < 1:
+        return "--weight must be at least 1"
+    return None
+
+def check_solver_arguments(parser, args, algos):
+    error = solver_argument_error(args, algos)
+    if error is not None:
+        parser.error(error)
+
+# pattern databases already loaded by this process, by (piece set, directory)
+loaded_pdbs = {}
+
+def make_heuristic(name, piece_set, pdb_dir):
+    if name == 'pdb':
+        if (piece_set, pdb_dir) not in loaded_pdbs:
+            loaded_pdbs[(piece_set, pdb_dir)] = pdb_heuristic(piece_set, pdb_dir)
+        return loaded_pdbs[(piece_set, pdb_dir)]
+    return key_manhattan_h
+
+def solve(board, args, stats=None):
+    """
+    Run the search picked by args.algo on a board, or take its solution from the
+    solution cache when the board was solved with the same search before.
+
+    :param board: The initial board.
+    :type board: Board
+    :param args: The solver options, as added by add_solver_arguments.
+    :type args: argparse.Namespace
+    :param stats: Filled in with the search counters when given.
+    :type stats: Optional[SearchStats]
+    :return: The goal state, whose parent chain is the solution, or None if there is none.
+    :rtype: Optional[State]
+    """
+    if stats is None:
+        stats = SearchStats()
+    start = perf_counter()
+    cache = solution_cache(args)
+    search = cache_signature(args) if cache is not None else None
+    init_id = hash_board_config(board)
+    found = False
+    if search is not None:
+        found, reach_goal = cache.lookup(init_id, search)
+    if not found:
+        reach_goal = run_search(board, args, stats)
+        # an anytime search stopped early, or an astar inside a portfolio, may not have the shortest
+        if search is not None and (stats.bound is None or stats.bound <= 1):
+            cache.store(init_id, search, reach_goal)
+    if search is not None:
+        stats.cache_hit = found
+    if cache is not None:
+        stats.cache_hit_rate = cache.hit_rate()
+    stats.seconds = perf_counter() - start
+    stats.depth = reach_goal.depth if reach_goal is not None else None
+    return reach_goal
+
+def run_search(board, args, stats):
+    # only the algorithms that use a heuristic build one, pattern databases can take a while
+    if args.algo in ('astar', 'arastar', 'idastar'):
+        heuristic = make_heuristic(args.heuristic, piece_set_of(hash_board_config(board)), args.pdb_dir)
+    if args.algo == 'dfs':
+        return dfs(board, args.symmetry, stats, args.verbose, args.closed, args.bloom_mb)
+    elif args.algo == 'astar':
+        return astar(board, args.symmetry, heuristic, stats, args.verbose, args.frontier, args.closed,
+                     args.weight or 1)
+    elif args.algo == 'arastar':
+        return arastar(board, heuristic, stats, args.weight or arastar_weight, args.time_limit)
+    elif args.algo == 'idastar':
+        return idastar(board, heuristic, args.tt_mb, args.tt_policy, stats)
+    elif args.algo == 'bibfs':
+        return bibfs(board, stats)
+    elif args.algo == 'bfs':
+        return bfs(board, stats)
+    elif args.algo == 'portfolio':
+        return portfolio(board, args, stats)
+    elif args.algo == 'hda':
+        return hda_star(board, args.heuristic, args.pdb_dir, args.workers, stats)
+    elif args.algo == 'db':
+        db = DistanceDB(args.db)
+        try:
+            return db_solve(board, db, stats)
+        finally:
+            db.close()
+    raise ValueError('unknown algorithm {}'.format(args.algo))
+
+def expand_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py expand',
+        description="Turn a solution written with --format moves into the board by board format.")
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The solution in the moves format."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The solution in the board by board format."
+    )
+    args = parser.parse_args(argv)
+    expand_moves(args.inputfile, args.outputfile)
+
+class SearchTimeout(Exception):
+    pass
+
+def raise_search_timeout(signum, frame):
+    raise SearchTimeout()
+
+def solve_file(input_path, output_path, args, timeout=None):
+    # batch worker: solve one puzzle file, and never let its failure escape
+    row = {'puzzle': os.path.basename(input_path), 'status': 'ok', 'moves': '', 'expanded': '', 'seconds': ''}
+    stats = SearchStats()
+    start = time.time()
+    if timeout:
+        signal.signal(signal.SIGALRM, raise_search_timeout)
+    try:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        reach_goal = solve(read_from_file(input_path), args, stats)
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if reach_goal is None:
+            row['status'] = 'no solution'
+        else:
+            write_to_text(reach_goal, output_path, args.format)
+            row['moves'] = reach_goal.depth
+    except SearchTimeout:
+        row['status'] = 'timeout'
+    except Exception as e:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        row['status'] = 'error: {}'.format(e)
+    row['expanded'] = stats.expanded
+    row['seconds'] = '{:.3f}'.format(time.time() - start)
+    return row
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py batch',
+        description="Solve every puzzle file in a directory on a pool of worker processes.")
+    parser.add_argument(
+        "--inputs",
+        type=str,
+        required=True,
+        help="The directory with the puzzle files."
+    )
+    parser.add_argument(
+        "--outdir",
+        type=str,
+        required=True,
+        help="The directory for the solution files and the summary."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Give up on a puzzle after this many seconds."
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        default=None,
+        help="The summary csv file, summary.csv in --outdir by default."
+    )
+    add_solver_arguments(parser)
+    args = parser.parse_args(argv)
+    check_solver_arguments(parser, args, [args.algo])
+
+    os.makedirs(args.outdir, exist_ok=True)
+    summary_path = args.summary or os.path.join(args.outdir, 'summary.csv')
+    puzzles = sorted(name for name in os.listdir(args.inputs) if os.path.isfile(os.path.join(args.inputs, name)))
+    failed = 0
+    with open(summary_path, 'w', newline='') as summary, ProcessPoolExecutor(args.jobs) as pool:
+        writer = csv.DictWriter(summary, ['puzzle', 'status', 'moves', 'expanded', 'seconds'])
+        writer.writeheader()
+        futures = {}
+        for name in puzzles:
+            output_path = os.path.join(args.outdir, os.path.splitext(name)[0] + '_sol.txt')
+            futures[pool.submit(solve_file, os.path.join(args.inputs, name), output_path, args, args.timeout)] = name
+        for future in as_completed(futures):
+            try:
+                row = future.result()
+            except Exception as e: # the worker process itself died
+                row = {'puzzle': futures[future], 'status': 'error: {}'.format(e)}
+            if row['status'] != 'ok':
+                failed += 1
+            writer.writerow(row)
+            summary.flush()
+    print("puzzles: {} failed: {} summary: {}".format(len(puzzles), failed, summary_path))
+
+#-------------------------------------------Below is the benchmark----------------------------------------------
+# hrd.py bench runs each algorithm over the puzzles in a corpus directory (puzzles/ holds
+# boards from at the goal up to the classic layout). Each puzzle and algorithm pair runs in
+# a fresh worker process, so the peak resident memory it reports belongs to that search
+# alone. Results can be saved as a json baseline, and later runs are compared against it.
+
+def bench_one(input_path, args, repeat, timeout):
+    # benchmark worker: the median of repeat runs of one puzzle with args.algo
+    import resource # Unix only, like the timeout alarm
+    row = {'status': 'ok', 'moves': None, 'expanded': 0, 'generated': 0}
+    times = []
+    if timeout:
+        signal.signal(signal.SIGALRM, raise_search_timeout)
+    try:
+        board = read_from_file(input_path)
+        if args.algo == 'bfs':
+            # import NumPy before the clock starts, the other rows pay no import either
+            import_numpy('--algo bfs')
+        for i in range(repeat):
+            stats = SearchStats()
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            reach_goal = solve(board, args, stats)
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            times.append(stats.seconds)
+        row['moves'] = stats.depth
+        row['expanded'] = stats.expanded
+        row['generated'] = stats.generated
+    except SearchTimeout:
+        row['status'] = 'timeout'
+    except Exception as e:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        row['status'] = 'error: {}'.format(e)
+    times.sort()
+    row['seconds'] = times[len(times) // 2] if times else None
+    row['nodes_per_second'] = row['expanded'] / row['seconds'] if row['seconds'] else None
+    # ru_maxrss is in kilobytes on Linux
+    row['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return row
+
+def bench_worker(results, input_path, args, repeat, timeout):
+    results.put(bench_one(input_path, args, repeat, timeout))
+
+def bench_isolated(input_path, args, repeat, timeout):
+    # bench_one in a fresh process of its own; a plain process rather than a pool worker,
+    # since pool workers are daemons and cannot start the processes of hda or a portfolio
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=bench_worker, args=(results, input_path, args, repeat, timeout))
+    process.start()
+    try:
+        while True:
+            try:
+                return results.get(timeout=0.5)
+            except Empty:
+                if process.exitcode is not None and results.empty():
+                    return {'status': 'error: the worker stopped with exit code {}'.format(process.exitcode)}
+    finally:
+        process.join()
+
+# runs faster than this are mostly noise and are not compared on time
+bench_min_seconds = 0.01
+
+def bench_regressions(results, baseline, threshold):
+    # the pairs that got slower, or expand more boards, by more than threshold
+    regressions = []
+    for name, row in results.items():
+        old = baseline.get(name)
+        if old is None or row['status'] != 'ok' or old['status'] != 'ok':
+            continue
+        for field in ('seconds', 'expanded', 'peak_rss_mb'):
+            if field == 'seconds' and max(old[field], row[field]) < bench_min_seconds:
+                continue
+            if old[field] and row[field] > old[field] * (1 + threshold):
+                regressions.append((name, field, old[field], row[field]))
+    return regressions
+
+def bench_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py bench',
+        description="Time the searching algorithms over a corpus of puzzles and compare against a baseline.")
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles'),
+        help="The directory with the puzzle files."
+    )
+    parser.add_argument(
+        "--algos",
+        type=str,
+        default='astar,dfs,bibfs',
+        help="Comma separated algorithms to run."
+    )
+    parser.add_argument(
+        "--frontiers",
+        type=str,
+        default='heap',
+        help="Comma separated astar open lists to run, each as its own row."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per puzzle; the median time is reported."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Give up on a puzzle after this many seconds per run."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default='bench_baseline.json',
+        help="The json baseline to compare against."
+    )
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help="Write the results as the new baseline."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Flag a result that is this fraction worse than the baseline."
+    )
+    add_solver_arguments(parser)
+    args = parser.parse_args(argv)
+    algos = args.algos.split(',')
+    for algo in algos:
+        if algo not in algorithms:
+            parser.error("unknown algorithm {}".format(algo))
+    check_solver_arguments(parser, args, algos)
+    frontiers = args.frontiers.split(',')
+    for frontier in frontiers:
+        if frontier not in open_lists:
+            parser.error("unknown frontier {}".format(frontier))
+    # astar gets a row per open list; the heap row is plain astar, the others are labelled
+    # like astar:buckets, so a row keeps its name whichever --frontiers it ran with
+    runs = []
+    for algo in algos:
+        if algo == 'astar':
+            runs.extend(('astar' if frontier == 'heap' else 'astar:' + frontier, dict(algo=algo, frontier=frontier))
+                        for frontier in frontiers)
+        else:
+            runs.append((algo, dict(algo=algo)))
+
+    puzzles = sorted(name for name in os.listdir(args.corpus) if os.path.isfile(os.path.join(args.corpus, name)))
+    results = {}
+    print("{:<28} {:<14} {:>6} {:>9} {:>9} {:>11} {:>8}".format(
+        'puzzle', 'algo', 'moves', 'expanded', 'seconds', 'nodes/sec', 'rss MB'))
+    for name in puzzles:
+        for algo, options in runs:
+            run_args = argparse.Namespace(**dict(vars(args), verbose=0, cache=None, **options))
+            row = bench_isolated(os.path.join(args.corpus, name), run_args, args.repeat, args.timeout)
+            results['{}/{}'.format(name, algo)] = row
+            if row['status'] == 'ok':
+                print("{:<28} {:<14} {:>6} {:>9} {:>9.3f} {:>11.0f} {:>8.1f}".format(
+                    name, algo, row['moves'] if row['moves'] is not None else '-', row['expanded'],
+                    row['seconds'], row['nodes_per_second'] or 0, row['peak_rss_mb']))
+            else:
+                print("{:<28} {:<14} {}".format(name, algo, row['status']))
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = bench_regressions(results, json.load(f)['results'], args.threshold)
+        for name, field, old, new in regressions:
+            print("regression: {} {} {:.4g} -> {:.4g}".format(name, field, old, new))
+        if not regressions:
+            print("no regressions against {}".format(args.baseline))
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'threshold': args.threshold, 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print("baseline written to {}".format(args.baseline))
+    return 1 if regressions else 0
+
+def enumerate_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py enumerate',
+        description="Enumerate every board reachable from the input board, breadth first and on disk.")
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The start board."
+    )
+    parser.add_argument(
+        "--outdir",
+        type=str,
+        required=True,
+        help="The directory for the layer files and the distance file."
+    )
+    parser.add_argument(
+        "--buffer-mb",
+        type=float,
+        default=64,
+        help="Memory in megabytes for the boards buffered before they are sorted and written."
+    )
+    args = parser.parse_args(argv)
+    init_id = hash_board_config(read_from_file(args.inputfile))
+    start = time.time()
+    sizes = external_bfs(init_id, args.outdir, args.buffer_mb,
+                         lambda depth, size: print("layer: {} boards: {}".format(depth, size)))
+    distance_path = os.path.join(args.outdir, 'distances.db')
+    write_distance_file(args.outdir, sizes, distance_path, piece_set_of(init_id), args.buffer_mb)
+    print("boards: {} layers: {} distances: {} time: {:.1f}s".format(
+        sum(sizes), len(sizes), distance_path, time.time() - start))
+
+def build_db_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py build-db',
+        description="Precompute the distance to the goal of every board with the same pieces as the input board.")
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="A puzzle with the piece set to build the database for."
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        required=True,
+        help="The database file to write."
+    )
+    args = parser.parse_args(argv)
+    piece_set = piece_set_of(hash_board_config(read_from_file(args.inputfile)))
+    start = time.time()
+    count, max_dist = build_distance_db(piece_set, args.db)
+    print("boards: {} max distance: {} time: {:.1f}s".format(count, max_dist, time.time() - start))
+
+def build_graph_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py build-graph',
+        description="Build the graph of every board reachable from the input board, for query-graph.")
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The start board."
+    )
+    parser.add_argument(
+        "--outdir",
+        type=str,
+        required=True,
+        help="The directory for the graph arrays."
+    )
+    parser.add_argument(
+        "--goals",
+        action='store_true',
+        help="Start from every goal board with the pieces of the input board instead, "
+             "which gives every board that can be solved."
+    )
+    args = parser.parse_args(argv)
+    init_id = hash_board_config(read_from_file(args.inputfile))
+    seed_keys = enumerate_goal_keys(piece_set_of(init_id)) if args.goals else [init_id]
+    start = time.time()
+    count, moves = build_state_graph(seed_keys, args.outdir,
+                                     lambda depth, size: print("layer: {} boards: {}".format(depth, size)))
+    print("boards: {} moves: {} time: {:.1f}s".format(count, moves, time.time() - start))
+
+def query_graph_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py query-graph',
+        description="Answer distance and neighbourhood questions from a graph built by build-graph.")
+    parser.add_argument(
+        "--graph",
+        type=str,
+        required=True,
+        help="The directory build-graph wrote."
+    )
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The board the query starts from."
+    )
+    parser.add_argument(
+        "--to",
+        type=str,
+        help="A board to find a shortest path to from the input board."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        help="Where to write the path found with --to."
+    )
+    parser.add_argument(
+        "--format",
+        choices=['grid', 'moves'],
+        default='grid',
+        help="How the path is written, see the solver's --format."
+    )
+    parser.add_argument(
+        "--radius",
+        type=int,
+        help="Count the boards at each distance up to this many moves from the input board."
+    )
+    args = parser.parse_args(argv)
+    if args.to is None and args.radius is None:
+        parser.error("one of --to or --radius is required")
+    graph = StateGraph(args.graph)
+    init_id = hash_board_config(read_from_file(args.inputfile))
+    try:
+        if args.radius is not None:
+            keys, distances = graph.neighbourhood(init_id, args.radius)
+            for depth, size in enumerate(graph.np.bincount(distances)):
+                print("distance: {} boards: {}".format(depth, size))
+        if args.to is not None:
+            start = time.time()
+            path = graph.shortest_path(init_id, hash_board_config(read_from_file(args.to)))
+            if path is None:
+                print("no path")
+                return 1
+            print("distance: {} time: {:.6f}s".format(len(path) - 1, time.time() - start))
+            if args.outputfile:
+                write_to_text(state_chain(path), args.outputfile, args.format)
+    except KeyError as e:
+        print(e.args[0])
+        return 1
+
+def count_solutions_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py count-solutions',
+        description="Count the shortest solutions of a puzzle, and list or sample them.")
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="The input file that contains the puzzle."
+    )
+    parser.add_argument(
+        "--outdir",
+        type=str,
+        help="The directory to write the listed or sampled solutions to, one file each."
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=0,
+        help="List the first this many shortest solutions."
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=0,
+        help="Draw this many shortest solutions uniformly at random, with replacement."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for --sample, to draw the same solutions again."
+    )
+    parser.add_argument(
+        "--format",
+        choices=['grid', 'moves'],
+        default='grid',
+        help="How the solutions are written, see the solver's --format."
+    )
+    args = parser.parse_args(argv)
+    if (args.limit or args.sample) and not args.outdir:
+        parser.error("--limit and --sample need --outdir")
+    start = time.time()
+    solutions = OptimalSolutions(read_from_file(args.inputfile))
+    print("shortest: {} solutions: {} time: {:.1f}s".format(solutions.length, solutions.count, time.time() - start))
+    if not solutions.count:
+        return 1
+    if args.limit or args.sample:
+        os.makedirs(args.outdir, exist_ok=True)
+    rng = random.Random(args.seed)
+    samples = (solutions.sample(rng) for i in range(args.sample))
+    for name, paths in (('solution', islice(solutions, args.limit)), ('sample', samples)):
+        for i, path in enumerate(paths):
+            write_to_text(state_chain(path), os.path.join(args.outdir, '{}_{:06d}.txt'.format(name, i)), args.format)
+
+
+#-------------------------------------------Below is the solver service----------------------------------------------
+# hrd.py serve keeps a pool of solver processes alive, so the move tables, pattern
+# databases and solution cache each worker has loaded stay warm between puzzles. Requests
+# are json objects, one per line on stdin (answers go to stdout, one per line, in the order
+# they finish) or POSTed to /solve when --http is given:
+#
+#   {"id": 1, "board": "^11^\nv11v\n^<>^\nv22v\n2..2\n", "algo": "astar", "format": "moves", "timeout": 10}
+#   {"id": 1, "op": "cancel"}      drop a request that has not finished
+#   {"op": "metrics"}              the same as GET /metrics over http
+#
+# Only "board" is required; the other fields default to the options serve was started with.
+# A request's timeout (a positive number of seconds) runs from when it arrives, so time spent
+# waiting for a free worker counts too. Each worker is a process of its own fed over a pipe:
+# when a running request times out or is cancelled its worker is killed and a fresh one
+# started in its place, so the worker is free again at once; a queued one just leaves the queue.
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# the solver options a request may override, and what each has to be
+request_options = {
+    'algo': lambda value: value in algorithms,
+    'format': lambda value: value in ('grid', 'moves'),
+    'heuristic': lambda value: value in ('manhattan', 'pdb'),
+    'symmetry': lambda value: isinstance(value, bool),
+    'weight': lambda value: value is None or is_number(value),
+    'time_limit': lambda value: value is None or (is_number(value) and value > 0),
+}
+
+def serve_solve(board_lines, args):
+    # service worker: solve one board and return the answer, never raising
+    answer = {'status': 'ok'}
+    stats = SearchStats()
+    try:
+        reach_goal = solve(read_board_lines(board_lines), args, stats)
+        if reach_goal is None:
+            answer['status'] = 'no solution'
+        else:
+            answer['moves'] = reach_goal.depth
+            answer['solution'] = solution_text(reach_goal, args.format).decode()
+    except Exception as e:
+        answer['status'] = 'error: {}'.format(e)
+    answer['expanded'] = stats.expanded
+    answer['cache_hit'] = stats.cache_hit
+    return answer
+
+def serve_worker(conn, parent_conn):
+    # the loop of one worker process: (board lines, args) in, answer out, until the pipe closes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    parent_conn.close()
+    while True:
+        try:
+            board_lines, args = conn.recv()
+        except EOFError:
+            return
+        conn.send(serve_solve(board_lines, args))
+
+class ServeWorker:
+    """
+    One solver process of hrd.py serve, and the pipe it takes requests from.
+    """
+
+    def __init__(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        # not a daemon: a daemon process cannot start the workers of hda or a portfolio
+        self.process = multiprocessing.Process(target=serve_worker, args=(child_conn, self.conn))
+        self.process.start()
+        child_conn.close()
+
+    async def solve(self, board_lines, args):
+        # hand one board to the process and wait, without blocking the event loop, for the answer
+        loop = asyncio.get_running_loop()
+        self.conn.send((board_lines, args))
+        ready = loop.create_future()
+        loop.add_reader(self.conn.fileno(), lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(self.conn.fileno())
+        return self.conn.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class SolverService:
+    """
+    The asyncio side of hrd.py serve: hands requests to the worker pool and keeps the
+    numbers reported by the metrics request.
+    """
+
+    latency_window = 1000
+
+    def __init__(self, args):
+        """
+        :param args: The serve options, which include the solver options every request starts from.
+        :type args: argparse.Namespace
+        """
+        self.args = args
+        self.workers = [ServeWorker() for job in range(args.jobs)]
+        self.idle = asyncio.Queue()
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+        self.tasks = {}
+        # requests being solved, and those waiting for a worker
+        self.running = 0
+        self.waiting = 0
+        self.counts = {'ok': 0, 'no solution': 0, 'timeout': 0, 'cancelled': 0, 'error': 0}
+        self.latencies = deque(maxlen=self.latency_window)
+        self.started = time.time()
+
+    async def handle(self, request):
+        """
+        Answer one request.
+
+        :param request: The decoded json request.
+        :type request: dict
+        :rtype: dict
+        """
+        op = request.get('op', 'solve')
+        if op == 'metrics':
+            return self.metrics()
+        if op == 'health':
+            return {'status': 'ok'}
+        if op == 'cancel':
+            task = self.tasks.get(request.get('id'))
+            if task is not None:
+                task.cancel()
+            return {'id': request.get('id'), 'status': 'cancelled' if task is not None else 'unknown id'}
+        if op != 'solve' or not isinstance(request.get('board'), str):
+            return {'id': request.get('id'), 'status': 'error: a request needs a board'}
+        task = asyncio.ensure_future(self.solve(request))
+        if 'id' in request:
+            self.tasks[request['id']] = task
+        try:
+            return await task
+        except asyncio.CancelledError:
+            self.counts['cancelled'] += 1
+            return {'id': request.get('id'), 'status': 'cancelled'}
+        finally:
+            if self.tasks.get(request.get('id')) is task:
+                del self.tasks[request['id']]
+
+    async def solve(self, request):
+        args = self.args
+        options = {name: request[name] for name in request_options if name in request}
+        for name, value in options.items():
+            if not request_options[name](value):
+                return {'id': request.get('id'), 'status': 'error: {} cannot be {}'.format(name, json.dumps(value))}
+        run_args = argparse.Namespace(**dict(vars(args), verbose=0, **options))
+        # the same checks the command line gets
+        error = solver_argument_error(run_args, [run_args.algo])
+        if error is not None:
+            return {'id': request.get('id'), 'status': 'error: {}'.format(error)}
+        timeout = request.get('timeout', args.timeout)
+        if not is_number(timeout) or not timeout > 0:
+            return {'id': request.get('id'), 'status': 'error: timeout must be a positive number of seconds'}
+        start = time.time()
+        try:
+            answer = await asyncio.wait_for(self.run(request['board'].splitlines(), run_args), timeout)
+        except asyncio.TimeoutError:
+            answer = {'status': 'timeout'}
+        seconds = time.time() - start
+        self.latencies.append(seconds)
+        self.counts[answer['status'] if answer['status'] in self.counts else 'error'] += 1
+        answer['id'] = request.get('id')
+        answer['seconds'] = round(seconds, 6)
+        return answer
+
+    async def run(self, board_lines, args):
+        # wait for a free worker and solve on it; a worker interrupted mid-solve is replaced
+        self.waiting += 1
+        try:
+            worker = await self.idle.get()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await worker.solve(board_lines, args)
+        except asyncio.CancelledError:
+            worker = self.replace(worker)
+            raise
+        except (EOFError, OSError) as e: # the worker process itself died
+            worker = self.replace(worker)
+            return {'status': 'error: the worker stopped: {!r}'.format(e)}
+        finally:
+            self.running -= 1
+            self.idle.put_nowait(worker)
+
+    def replace(self, worker):
+        worker.kill()
+        self.workers.remove(worker)
+        self.workers.append(ServeWorker())
+        return self.workers[-1]
+
+    def close(self):
+        for worker in self.workers:
+            worker.kill()
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+
+        return {
+            'uptime_seconds': round(time.time() - self.started, 3),
+            'queue_depth': self.waiting,
+            'in_flight': self.running + self.waiting,
+            'workers': self.args.jobs,
+            'answered': dict(self.counts),
+            'latency_p50': percentile(0.5),
+            'latency_p90': percentile(0.9),
+            'latency_p99': percentile(0.99),
+        }
+
+async def serve_json_lines(service):
+    # one json request per line on stdin; answers are written as they finish
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    pending = set()
+
+    async def answer(request):
+        response = await service.handle(request)
+        sys.stdout.write(json.dumps(response) + '\n')
+        sys.stdout.flush()
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            request = {'op': 'invalid', 'error': str(e)}
+        if not isinstance(request, dict):
+            request = {'op': 'invalid'}
+        task = asyncio.ensure_future(answer(request))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+
+http_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+async def serve_http_connection(service, reader, writer):
+    # a small HTTP/1.1 server: POST /solve, GET /health and GET /metrics, one request a connection
+    status, response = 400, {'status': 'error: bad request'}
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) >= 2:
+            method, target = request_line[0], request_line[1]
+            if target in ('/health', '/metrics'):
+                status, response = 200, await service.handle({'op': target[1:]})
+            elif target != '/solve':
+                status, response = 404, {'status': 'error: unknown path'}
+            elif method != 'POST':
+                status, response = 405, {'status': 'error: use POST'}
+            else:
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                request = json.loads(body)
+                if isinstance(request, dict):
+                    status, response = 200, await service.handle(request)
+    except (ValueError, asyncio.IncompleteReadError) as e:
+        status, response = 400, {'status': 'error: {}'.format(e)}
+    body = json.dumps(response).encode()
+    writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                 'Connection: close\r\n\r\n'.format(status, http_reasons[status], len(body)).encode() + body)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve_http(service, host, port):
+    server = await asyncio.start_server(lambda reader, writer: serve_http_connection(service, reader, writer),
+                                        host, port)
+    print("serving on http://{}:{}".format(host, port), file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(prog='hrd.py serve',
+        description="Keep the solver running and answer json requests from stdin or over http.")
+    parser.add_argument(
+        "--http",
+        type=str,
+        default=None,
+        help="Listen on HOST:PORT for http requests instead of reading json lines from stdin."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Default seconds a request may take before it is answered with a timeout."
+    )
+    add_solver_arguments(parser)
+    args = parser.parse_args(argv)
+    check_solver_arguments(parser, args, [args.algo])
+    if not args.timeout > 0:
+        parser.error("--timeout must be a positive number of seconds")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    service = SolverService(args)
+    # stop the workers on a plain kill too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if args.http:
+            host, _, port = args.http.rpartition(':')
+            asyncio.run(serve_http(service, host or '127.0.0.1', int(port)))
+        else:
+            asyncio.run(serve_json_lines(service))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+commands = {
+    'build-db': build_db_main,
+    'batch': batch_main,
+    'expand': expand_main,
+    'bench': bench_main,
+    'enumerate': enumerate_main,
+    'build-graph': build_graph_main,
+    'query-graph': query_graph_main,
+    'count-solutions': count_solutions_main,
+    'serve': serve_main,
+}
 
 if __name__ == "__main__":
 
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        sys.exit(commands[sys.argv[1]](sys.argv[2:]))
+
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--inputfile",
@@ -774,62 +3715,30 @@ if __name__ == "__main__":
         help="The output file that contains the solution."
     )
     parser.add_argument(
-        "--algo",
+        "--stats",
         type=str,
-        required=True,
-        choices=['astar', 'dfs'],
-        help="The searching algorithm."
+        default=None,
+        help="Write the search counters to this json file."
     )
+    add_solver_arguments(parser, algo_required=True)
     args = parser.parse_args()
+    check_solver_arguments(parser, args, [args.algo])
 
     # read the board from the file
     board = read_from_file(args.inputfile)
-    
-
-    #print(sys.getrecursionlimit())
-    #sys.setrecursionlimit(2000)
-    output_file = args.outputfile
-    #print('below is user expected output file:')
-    #print(output_file)
-    #print(board.grid)
-    '''Glen's code below:
-    print(hash_board_config(board))
-    print(hash_board_config(board))
-
-    print(board.grid)
-    
-    s = str(board.grid)
-    print(s)
-    print(type(s))
-    #print('\n')
-    a = hash(s)
-    print(a)
-    
-    print('\n now it is b time: ')
-    print(board.grid)
-    print(str(board.grid))
-    b = hash(str(board.grid))
-    print(b)
-    '''
-
- 
-    if args.algo == 'dfs':
-        reach_goal = dfs(board)
-        #test this by see if reach_goal is at goal state
-        #print(reach_goal)
-        #reach_goal.board.display()
-        write_to_text(reach_goal)
 
-        #start_to_goal = order_ini_to_goal(reach_goal) # this function reversed the order of this reach_goal linked list
-
-        #do: helpfer function to generate path from inital to goal
-        #order_ini_to_goal(reach_goal)
-        #do: helper function to write this order_ini_to_goal into txt
-        #write_path_to_output_txt
-
-    elif args.algo == 'astar':
-        reach_goal = astar(board)
-        write_to_text(reach_goal)
+    stats = SearchStats()
+    reach_goal = solve(board, args, stats)
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(dict(stats.as_dict(), algo=args.algo), f, indent=2)
+    if args.verbose:
+        for name, value in stats.as_dict().items():
+            print("{}: {}".format(name, value))
+    if reach_goal is None:
+        sys.exit("no solution")
+    write_to_text(reach_goal, args.outputfile, args.format)
+    if args.algo != 'dfs':
         print("count: ", reach_goal.depth)
     
     
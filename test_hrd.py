@@ -0,0 +1,740 @@
+import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+import hrd
+
+hrd_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hrd.py')
+puzzle_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles')
+
+# the number of moves of a shortest solution of each puzzle in puzzles/
+shortest_moves = {
+    '00_at_goal.txt': 0,
+    '01_one_move.txt': 1,
+    '02_10_moves.txt': 10,
+    '03_30_moves.txt': 30,
+    '04_50_moves.txt': 50,
+    '05_70_moves.txt': 70,
+    '06_90_moves.txt': 90,
+    '07_corners_100_moves.txt': 100,
+    '08_classic.txt': 116,
+}
+
+# sha256 of the grid output of the original dfs, which the packed encoding must reproduce
+baseline_dfs_output = {
+    '02_10_moves.txt': '444f2bf38b9c7bad219a0dd84e9af030ef229aa7d1318f051d453bd9833f175d',
+    '03_30_moves.txt': '57bd3185486ceeb3c5c205222aa3c0a305c092fec466978c51d8b227bf16a3bd',
+    '04_50_moves.txt': '39f527076d9dad5b592e41f860fd46dc2c8de5de0bdb634c8903b2e6d8ce1401',
+}
+
+has_numpy = importlib.util.find_spec('numpy') is not None
+
+def read_puzzle(name):
+    return hrd.read_from_file(os.path.join(puzzle_dir, name))
+
+def solver_args(*argv):
+    parser = argparse.ArgumentParser()
+    hrd.add_solver_arguments(parser)
+    return parser.parse_args(list(argv))
+
+def puzzle_text(name):
+    with open(os.path.join(puzzle_dir, name)) as f:
+        return f.read()
+
+def piece_cells(piece):
+    y, x = piece.coord_y, piece.coord_x
+    if piece.is_goal:
+        return {(y, x), (y, x + 1), (y + 1, x), (y + 1, x + 1)}
+    if piece.is_single:
+        return {(y, x)}
+    if piece.orientation == 'h':
+        return {(y, x), (y, x + 1)}
+    return {(y, x), (y + 1, x)}
+
+def grid_successors(key):
+    # the original move generation: decode the board and slide every piece one cell in each
+    # direction wherever the grid is free
+    board = hrd.board_from_key(key)
+    grid = board.grid
+    children = set()
+    for piece in board.pieces:
+        cells = piece_cells(piece)
+        for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            if all(0 <= y + dy < 5 and 0 <= x + dx < 4 and
+                   ((y + dy, x + dx) in cells or grid[y + dy][x + dx] == '.') for y, x in cells):
+                piece.coord_y += dy
+                piece.coord_x += dx
+                children.add(hrd.hash_board_config(board))
+                piece.coord_y -= dy
+                piece.coord_x -= dx
+    return children
+
+def distances_from(init_id):
+    # the distance of every board reachable from init_id, with a plain breadth first search
+    dist = {init_id: 0}
+    layer = [init_id]
+    while layer:
+        next_layer = []
+        for key in layer:
+            for succ, succ_pair in hrd.successor_keys(key, hrd.empty_pair_of(key)):
+                if succ not in dist:
+                    dist[succ] = dist[key] + 1
+                    next_layer.append(succ)
+        layer = next_layer
+    return dist
+
+
+class MoveGenerationTest(unittest.TestCase):
+
+    def test_move_table_matches_grid_scan(self):
+        # every board reachable from the classic layout, enumerated with the grid scan
+        init_id = hrd.hash_board_config(read_puzzle('08_classic.txt'))
+        seen = {init_id}
+        layer = [init_id]
+        while layer:
+            next_layer = []
+            for key in layer:
+                expected = grid_successors(key)
+                children = list(hrd.successor_keys(key, hrd.empty_pair_of(key)))
+                self.assertEqual({succ for succ, succ_pair in children}, expected)
+                self.assertEqual(len(children), len(expected))
+                for succ, succ_pair in children:
+                    self.assertEqual(succ_pair, hrd.empty_pair_of(succ))
+                next_layer.extend(succ for succ in expected if succ not in seen)
+                seen.update(expected)
+            layer = next_layer
+        self.assertEqual(len(seen), 25955)
+
+
+class SolutionTestCase(unittest.TestCase):
+
+    def assert_solution(self, name, reach_goal, moves):
+        # reach_goal has to be a legal path from the puzzle to a goal board of the given length
+        self.assertIsNotNone(reach_goal, name)
+        self.assertEqual(reach_goal.depth, moves, name)
+        self.assertEqual(reach_goal.id & hrd.goal_mask, hrd.goal_bits, name)
+        curr = reach_goal
+        while curr.parent is not None:
+            self.assertIn(curr.id, grid_successors(curr.parent.id), name)
+            curr = curr.parent
+        self.assertEqual(curr.id, hrd.hash_board_config(read_puzzle(name)), name)
+
+    def assert_optimal(self, *argv, max_moves=None):
+        args = solver_args(*argv)
+        for name, moves in sorted(shortest_moves.items()):
+            if max_moves is None or moves <= max_moves:
+                with self.subTest(puzzle=name):
+                    self.assert_solution(name, hrd.solve(read_puzzle(name), args), moves)
+
+
+class SolverTest(SolutionTestCase):
+
+    def test_astar(self):
+        self.assert_optimal('--algo', 'astar')
+
+    def test_astar_buckets(self):
+        self.assert_optimal('--algo', 'astar', '--frontier', 'buckets', '--closed', 'table')
+
+    def test_astar_symmetry(self):
+        self.assert_optimal('--algo', 'astar', '--symmetry')
+        # the classic layout is its own mirror image, so a mirror class is mostly two boards
+        stats, symmetric_stats = hrd.SearchStats(), hrd.SearchStats()
+        board = read_puzzle('08_classic.txt')
+        hrd.solve(board, solver_args('--algo', 'astar'), stats)
+        hrd.solve(board, solver_args('--algo', 'astar', '--symmetry'), symmetric_stats)
+        self.assertLess(symmetric_stats.expanded, stats.expanded * 0.6)
+
+    def test_dfs_symmetry(self):
+        # dfs does not look for the shortest solution, but the path must still be legal
+        # even when it went through a board that was explored as its mirror image
+        args = solver_args('--algo', 'dfs', '--symmetry')
+        for name, moves in sorted(shortest_moves.items()):
+            with self.subTest(puzzle=name):
+                reach_goal = hrd.solve(read_puzzle(name), args)
+                self.assertIsNotNone(reach_goal)
+                self.assertGreaterEqual(reach_goal.depth, moves)
+                self.assert_solution(name, reach_goal, reach_goal.depth)
+
+    def test_bibfs(self):
+        self.assert_optimal('--algo', 'bibfs')
+
+    @unittest.skipUnless(has_numpy, 'numpy is not installed')
+    def test_bfs(self):
+        self.assert_optimal('--algo', 'bfs')
+
+    def test_arastar(self):
+        self.assert_optimal('--algo', 'arastar')
+
+    def test_idastar(self):
+        # idastar with the Manhattan heuristic takes minutes on the deepest boards
+        self.assert_optimal('--algo', 'idastar', max_moves=50)
+
+    def test_hda(self):
+        self.assert_optimal('--algo', 'hda', '--workers', '2')
+
+    def test_portfolio(self):
+        self.assert_optimal('--algo', 'portfolio', '--quality', 'optimal', '--engines', 'astar,bibfs')
+
+    def test_db(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, moves in sorted(shortest_moves.items()):
+                with self.subTest(puzzle=name):
+                    board = read_puzzle(name)
+                    path = os.path.join(tmp, 'db')
+                    hrd.build_distance_db(hrd.piece_set_of(hrd.hash_board_config(board)), path)
+                    self.assert_solution(name, hrd.solve(board, solver_args('--algo', 'db', '--db', path)), moves)
+
+    def test_dfs_matches_baseline(self):
+        args = solver_args('--algo', 'dfs')
+        for name, digest in sorted(baseline_dfs_output.items()):
+            with self.subTest(puzzle=name):
+                reach_goal = hrd.solve(read_puzzle(name), args)
+                self.assertEqual(hashlib.sha256(hrd.solution_text(reach_goal)).hexdigest(), digest)
+
+
+class PatternDatabaseTest(SolutionTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the pattern databases are built once, in a directory of their own
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.pdb_dir = os.path.join(cls.tmp.name, 'pdb')
+
+    @classmethod
+    def tearDownClass(cls):
+        hrd.loaded_pdbs.clear()
+        cls.tmp.cleanup()
+
+    def assert_optimal(self, *argv, max_moves=None):
+        super().assert_optimal(*argv, '--heuristic', 'pdb', '--pdb-dir', self.pdb_dir, max_moves=max_moves)
+
+    def test_astar(self):
+        self.assert_optimal('--algo', 'astar')
+
+    def test_arastar(self):
+        self.assert_optimal('--algo', 'arastar')
+
+    def test_idastar(self):
+        # still minutes on the two deepest boards
+        self.assert_optimal('--algo', 'idastar', max_moves=70)
+
+    def test_hda(self):
+        self.assert_optimal('--algo', 'hda', '--workers', '2')
+
+    def test_bounds(self):
+        # on every solvable board with the pieces of the classic layout, the heuristic is at
+        # least the Manhattan distance and at most the true distance to the goal
+        piece_set = hrd.piece_set_of(hrd.hash_board_config(read_puzzle('08_classic.txt')))
+        heuristic = hrd.make_heuristic('pdb', piece_set, self.pdb_dir)
+        path = os.path.join(self.tmp.name, 'db')
+        hrd.build_distance_db(piece_set, path)
+        db = hrd.DistanceDB(path)
+        try:
+            for key, dist in zip(db.keys, db.dists):
+                self.assertLessEqual(hrd.key_manhattan_h(key), heuristic(key))
+                self.assertLessEqual(heuristic(key), dist)
+        finally:
+            db.close()
+
+
+class ClosedSetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # every board reachable from the classic layout, and as many ids that are not among them
+        seen = distances_from(hrd.hash_board_config(read_puzzle('08_classic.txt')))
+        cls.keys = sorted(seen)
+        others = set()
+        rng = random.Random(0)
+        while len(others) < len(seen):
+            key = rng.getrandbits(60) + 1
+            if key not in seen:
+                others.add(key)
+        cls.others = sorted(others)
+
+    def test_key_table(self):
+        table = hrd.KeyTable(values=True)
+        for i, key in enumerate(self.keys):
+            table[key] = i % 200
+        for key in self.keys[::2]:
+            table.add(key)
+        # it grew from 1024 slots and stayed at most half full
+        self.assertEqual(len(table), len(self.keys))
+        self.assertGreaterEqual(len(table.keys), 2 * len(self.keys))
+        for i, key in enumerate(self.keys):
+            self.assertIn(key, table)
+            self.assertEqual(table[key], i % 200)
+            self.assertEqual(table.get(key), i % 200)
+        for key in self.others:
+            self.assertNotIn(key, table)
+            self.assertIsNone(table.get(key))
+        self.assertRaises(KeyError, table.__getitem__, self.others[0])
+
+    def test_bloom_filter(self):
+        for size_mb in (16, 0.001, 0):
+            with self.subTest(size_mb=size_mb):
+                bloom = hrd.BloomFilter(size_mb)
+                for key in self.keys:
+                    bloom.add(key)
+                # an id that was added is always found, however full the filter
+                for key in self.keys:
+                    self.assertIn(key, bloom)
+        # the last filter has only 64 bits, all of them set by now
+        self.assertTrue(all(key in bloom for key in self.others))
+        bloom = hrd.BloomFilter(1)
+        for key in self.keys:
+            bloom.add(key)
+        # 8 million bits for 26 thousand ids, 4 bits each: a few in 10^8 wrongly found
+        self.assertLessEqual(sum(key in bloom for key in self.others), 1)
+
+    def test_searches_agree(self):
+        for name in ('03_30_moves.txt', '08_classic.txt'):
+            board = read_puzzle(name)
+            for algo in ('dfs', 'astar'):
+                with self.subTest(puzzle=name, algo=algo):
+                    stats, table_stats = hrd.SearchStats(), hrd.SearchStats()
+                    reach_goal = hrd.solve(board, solver_args('--algo', algo), stats)
+                    table_goal = hrd.solve(board, solver_args('--algo', algo, '--closed', 'table'), table_stats)
+                    self.assertEqual(hrd.solution_text(table_goal), hrd.solution_text(reach_goal))
+                    self.assertEqual(table_stats.expanded, stats.expanded)
+                    if stats.expanded > 2000:
+                        # the table starts with 1024 slots, so it only saves memory on larger searches
+                        self.assertLess(table_stats.closed_bytes, stats.closed_bytes / 2)
+            with self.subTest(puzzle=name, algo='dfs', closed='bloom'):
+                # with a filter this large no board is wrongly skipped, so dfs goes the same way
+                reach_goal = hrd.solve(board, solver_args('--algo', 'dfs', '--closed', 'bloom', '--bloom-mb', '1'))
+                self.assertEqual(hrd.solution_text(reach_goal), hrd.solution_text(hrd.solve(board, solver_args('--algo', 'dfs'))))
+
+
+class ExternalBfsTest(unittest.TestCase):
+
+    def test_layers_and_distances(self):
+        init_id = hrd.hash_board_config(read_puzzle('08_classic.txt'))
+        dist = distances_from(init_id)
+        expected_sizes = [0] * (max(dist.values()) + 1)
+        for d in dist.values():
+            expected_sizes[d] += 1
+        run_counts = []
+
+        def counting_reduce_runs(run_paths, fan_in, next_run_path):
+            run_counts.append(len(run_paths))
+            return reduce_runs(run_paths, fan_in, next_run_path)
+
+        reduce_runs = hrd.reduce_runs
+        with tempfile.TemporaryDirectory() as tmp:
+            # the smallest buffer holds 1024 children and merges two files at a time, so a
+            # layer takes several runs and the 168 layers several passes to merge
+            for buffer_mb in (0.01, 64):
+                with self.subTest(buffer_mb=buffer_mb):
+                    workdir = os.path.join(tmp, str(buffer_mb))
+                    with unittest.mock.patch.object(hrd, 'reduce_runs', counting_reduce_runs):
+                        sizes = hrd.external_bfs(init_id, workdir, buffer_mb)
+                    self.assertEqual(sizes, expected_sizes)
+                    path = os.path.join(workdir, 'distances.db')
+                    hrd.write_distance_file(workdir, sizes, path, hrd.piece_set_of(init_id), buffer_mb)
+                    # only the layers and the distance file are left, no runs or partial merges
+                    self.assertEqual(sorted(os.listdir(workdir)),
+                                     sorted(['distances.db'] + [os.path.basename(hrd.layer_path(workdir, d))
+                                                                for d in range(len(sizes))]))
+                    db = hrd.DistanceDB(path, hrd.bfs_magic)
+                    try:
+                        self.assertEqual(list(db.keys), sorted(dist))
+                        self.assertEqual(list(db.dists), [dist[key] for key in db.keys])
+                    finally:
+                        db.close()
+            self.assertGreater(max(run_counts), 2)
+            with open(os.path.join(tmp, '0.01', 'distances.db'), 'rb') as small, \
+                 open(os.path.join(tmp, '64', 'distances.db'), 'rb') as large:
+                self.assertEqual(small.read(), large.read())
+
+
+@unittest.skipUnless(has_numpy, 'numpy is not installed')
+class StateGraphTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.classic = hrd.hash_board_config(read_puzzle('08_classic.txt'))
+        # the board at the goal is not reachable from the classic layout
+        cls.at_goal = hrd.hash_board_config(read_puzzle('00_at_goal.txt'))
+        cls.boards, cls.moves = hrd.build_state_graph([cls.classic, cls.at_goal], cls.tmp.name)
+        cls.graph = hrd.StateGraph(cls.tmp.name)
+        cls.dist = distances_from(cls.classic)
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.graph
+        cls.tmp.cleanup()
+
+    def assert_path(self, path, start, goal, moves):
+        self.assertEqual((path[0], path[-1], len(path) - 1), (start, goal, moves))
+        for key, succ in zip(path, path[1:]):
+            self.assertIn(succ, grid_successors(key))
+
+    def test_graph(self):
+        self.assertEqual(self.boards, len(self.dist) + len(distances_from(self.at_goal)))
+        for key in list(self.dist)[::500]:
+            self.assertEqual(sorted(self.graph.neighbour_keys(key)), sorted(grid_successors(key)))
+        self.assertRaises(KeyError, self.graph.index, self.classic + 1)
+
+    def test_shortest_path(self):
+        rng = random.Random(0)
+        keys = sorted(self.dist)
+        for goal in rng.sample(keys, 20) + [self.classic]:
+            self.assert_path(self.graph.shortest_path(self.classic, goal), self.classic, goal, self.dist[goal])
+        # between two boards neither of which is the one the graph was built from
+        start, goal = rng.sample(keys, 2)
+        moves = distances_from(start)[goal]
+        self.assert_path(self.graph.shortest_path(start, goal), start, goal, moves)
+        self.assertEqual(self.graph.distance(goal, start), moves)
+        self.assertIsNone(self.graph.shortest_path(self.classic, self.at_goal))
+        self.assertIsNone(self.graph.distance(self.at_goal, self.classic))
+        self.assertRaises(KeyError, self.graph.shortest_path, self.classic, self.classic + 1)
+
+    def test_neighbourhood(self):
+        for radius in (0, 1, 10, 1000):
+            with self.subTest(radius=radius):
+                keys, distances = self.graph.neighbourhood(self.classic, radius)
+                expected = sorted((d, key) for key, d in self.dist.items() if d <= radius)
+                self.assertEqual(sorted(zip(distances.tolist(), keys.tolist())), expected)
+                self.assertEqual(list(distances), sorted(distances))
+
+
+class OptimalSolutionsTest(unittest.TestCase):
+
+    # no sequence of moves brings the 2x2 piece down to the goal
+    unsolvable = '11<>\n11<>\n<><>\n<><>\n<>..\n'
+
+    def shortest_solution_count(self, init_id):
+        # counted from the other end: the distance of every board to its nearest goal board,
+        # and the moves that bring a board one closer
+        dist = hrd.retrograde_distances(hrd.enumerate_goal_keys(hrd.piece_set_of(init_id)))
+        ways = {}
+
+        def count(key):
+            if dist[key] == 0:
+                return 1
+            if key not in ways:
+                ways[key] = sum(count(succ) for succ in grid_successors(key) if dist[succ] == dist[key] - 1)
+            return ways[key]
+        return count(init_id)
+
+    def assert_solution_path(self, name, path):
+        self.assertEqual(path[0], hrd.hash_board_config(read_puzzle(name)))
+        self.assertEqual(len(path) - 1, shortest_moves[name])
+        self.assertEqual(path[-1] & hrd.goal_mask, hrd.goal_bits)
+        for key, succ in zip(path, path[1:]):
+            self.assertIn(succ, grid_successors(key))
+
+    def test_count(self):
+        for name in ('00_at_goal.txt', '01_one_move.txt', '02_10_moves.txt', '03_30_moves.txt', '08_classic.txt'):
+            with self.subTest(puzzle=name):
+                solutions = hrd.OptimalSolutions(read_puzzle(name))
+                self.assertEqual(solutions.length, shortest_moves[name])
+                init_id = hrd.hash_board_config(read_puzzle(name))
+                self.assertEqual(solutions.count, self.shortest_solution_count(init_id))
+        self.assertEqual(hrd.OptimalSolutions(read_puzzle('08_classic.txt')).count, 4112640000)
+
+    def test_enumerate_and_sample(self):
+        for name, count in (('00_at_goal.txt', 1), ('02_10_moves.txt', 4), ('03_30_moves.txt', 760)):
+            with self.subTest(puzzle=name):
+                solutions = hrd.OptimalSolutions(read_puzzle(name))
+                paths = list(solutions)
+                self.assertEqual(len(paths), count)
+                self.assertEqual(len(set(map(tuple, paths))), count)
+                for path in paths:
+                    self.assert_solution_path(name, path)
+                rng = random.Random(0)
+                samples = {tuple(solutions.sample(rng)) for i in range(100)}
+                self.assertLessEqual(samples, set(map(tuple, paths)))
+        # with four solutions, each is drawn about a quarter of the time
+        solutions = hrd.OptimalSolutions(read_puzzle('02_10_moves.txt'))
+        rng = random.Random(0)
+        draws = {}
+        for i in range(400):
+            path = tuple(solutions.sample(rng))
+            draws[path] = draws.get(path, 0) + 1
+        self.assertEqual(len(draws), 4)
+        for drawn in draws.values():
+            self.assertTrue(60 < drawn < 140, draws.values())
+
+    def test_unsolvable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'unsolvable.txt')
+            with open(path, 'w') as f:
+                f.write(self.unsolvable)
+            solutions = hrd.OptimalSolutions(hrd.read_from_file(path))
+            self.assertEqual((solutions.count, solutions.length, list(solutions), solutions.sample()), (0, None, [], None))
+            result = subprocess.run([sys.executable, hrd_path, 'count-solutions', '--inputfile', path],
+                                    capture_output=True, text=True, timeout=60)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn('solutions: 0', result.stdout)
+
+    def test_command_line(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            command = [sys.executable, hrd_path, 'count-solutions', '--inputfile', os.path.join(puzzle_dir, '03_30_moves.txt'),
+                       '--outdir', tmp, '--limit', '2', '--sample', '3', '--seed', '1']
+            result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn('shortest: 30 solutions: 760', result.stdout)
+            self.assertEqual(sorted(os.listdir(tmp)), ['sample_000000.txt', 'sample_000001.txt', 'sample_000002.txt',
+                                                       'solution_000000.txt', 'solution_000001.txt'])
+            solutions = hrd.OptimalSolutions(read_puzzle('03_30_moves.txt'))
+            for i, path in enumerate(list(solutions)[:2]):
+                with open(os.path.join(tmp, 'solution_{:06d}.txt'.format(i)), 'rb') as f:
+                    self.assertEqual(f.read(), bytes(hrd.solution_text(hrd.state_chain(path))))
+            # the same seed draws the same solutions
+            with open(os.path.join(tmp, 'sample_000002.txt'), 'rb') as f:
+                sample = f.read()
+            subprocess.run(command, capture_output=True, timeout=60)
+            with open(os.path.join(tmp, 'sample_000002.txt'), 'rb') as f:
+                self.assertEqual(f.read(), sample)
+
+
+class SolutionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.sqlite')
+
+    def tearDown(self):
+        for cache in hrd.open_caches.values():
+            cache.db.close()
+        hrd.open_caches.clear()
+        self.tmp.cleanup()
+
+    def solve(self, board, *argv):
+        stats = hrd.SearchStats()
+        return hrd.solve(board, solver_args('--cache', self.path, *argv), stats), stats
+
+    def test_hit_and_mirror_image(self):
+        board = read_puzzle('03_30_moves.txt')
+        reach_goal, stats = self.solve(board, '--algo', 'astar')
+        self.assertFalse(stats.cache_hit)
+        reach_goal, stats = self.solve(board, '--algo', 'astar')
+        self.assertTrue(stats.cache_hit)
+        self.assertEqual(reach_goal.depth, 30)
+        # the mirror image shares the entry, and gets the solution mirrored back
+        mirror_id = hrd.mirror_key(hrd.hash_board_config(board))
+        reach_goal, stats = self.solve(hrd.board_from_key(mirror_id), '--algo', 'astar')
+        self.assertTrue(stats.cache_hit)
+        self.assertEqual(reach_goal.depth, 30)
+        curr = reach_goal
+        while curr.parent is not None:
+            self.assertIn(curr.id, grid_successors(curr.parent.id))
+            curr = curr.parent
+        self.assertEqual(curr.id, mirror_id)
+        # another search is another entry
+        reach_goal, stats = self.solve(board, '--algo', 'astar', '--heuristic', 'pdb', '--pdb-dir',
+                                       os.path.join(self.tmp.name, 'pdb'))
+        self.assertFalse(stats.cache_hit)
+
+    def test_inexact_settings_are_not_cached(self):
+        board = read_puzzle('08_classic.txt')
+        for argv in (('--algo', 'astar', '--weight', '3'),
+                     ('--algo', 'dfs', '--closed', 'bloom', '--bloom-mb', '0.0001'),
+                     ('--algo', 'portfolio', '--quality', 'any')):
+            with self.subTest(argv=argv):
+                reach_goal, stats = self.solve(board, *argv)
+                self.assertIsNone(stats.cache_hit)
+        reach_goal, stats = self.solve(board, '--algo', 'astar')
+        self.assertEqual((stats.cache_hit, reach_goal.depth), (False, 116))
+        reach_goal, stats = self.solve(board, '--algo', 'dfs')
+        self.assertFalse(stats.cache_hit)
+        self.assertIsNotNone(reach_goal)
+
+    def test_no_cache_overrides_cache(self):
+        reach_goal, stats = self.solve(read_puzzle('02_10_moves.txt'), '--algo', 'astar', '--no-cache')
+        self.assertIsNone(stats.cache_hit)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_hits_do_not_write_and_the_rate_is_kept(self):
+        board = read_puzzle('02_10_moves.txt')
+        self.solve(board, '--algo', 'astar')
+        cache = hrd.open_caches[(self.path, 10000)]
+        changes = cache.db.total_changes
+        for i in range(3):
+            reach_goal, stats = self.solve(board, '--algo', 'astar')
+        self.assertEqual(cache.db.total_changes, changes)
+        self.assertEqual(stats.cache_hit_rate, 0.75)
+        cache.flush()
+        self.assertEqual(hrd.SolutionCache(self.path).hit_rate(), 0.75)
+
+
+class StatsTest(unittest.TestCase):
+
+    def test_counters(self):
+        for algo in ('dfs', 'astar'):
+            with self.subTest(algo=algo):
+                stats = hrd.SearchStats()
+                reach_goal = hrd.solve(read_puzzle('03_30_moves.txt'), solver_args('--algo', algo), stats)
+                self.assertEqual(stats.depth, reach_goal.depth)
+                self.assertEqual(stats.peak_closed, stats.expanded)
+                self.assertGreater(stats.expanded, 0)
+                self.assertLessEqual(stats.duplicates, stats.generated)
+                self.assertEqual(stats.branching_factor, stats.generated / stats.expanded)
+                self.assertLessEqual(stats.movegen_seconds + stats.hash_seconds + stats.heap_seconds, stats.seconds)
+
+    def test_command_line(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            command = [sys.executable, hrd_path, '--algo', 'astar', '--inputfile', os.path.join(puzzle_dir, '03_30_moves.txt'),
+                       '--outputfile', os.path.join(tmp, 'sol.txt'), '--stats', os.path.join(tmp, 'stats.json')]
+            # without -v only the move count is printed
+            result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+            self.assertEqual(result.stdout.split(), ['count:', '30'])
+            with open(os.path.join(tmp, 'stats.json')) as f:
+                counters = json.load(f)
+            self.assertEqual((counters['algo'], counters['depth']), ('astar', 30))
+            # -v adds the counters, and -vv a line for every expanded board
+            result = subprocess.run(command + ['-v'], capture_output=True, text=True, timeout=60)
+            self.assertIn('expanded: {}'.format(counters['expanded']), result.stdout.splitlines())
+            result = subprocess.run(command + ['-vv'], capture_output=True, text=True, timeout=60)
+            lines = result.stdout.splitlines()
+            self.assertEqual(sum(line.isdigit() for line in lines), counters['expanded'])
+
+
+class SolutionFormatTest(unittest.TestCase):
+
+    def test_moves_format_expands_to_grid(self):
+        reach_goal = hrd.solve(read_puzzle('06_90_moves.txt'), solver_args('--algo', 'astar'))
+        with tempfile.TemporaryDirectory() as tmp:
+            moves_path = os.path.join(tmp, 'moves.txt')
+            grid_path = os.path.join(tmp, 'grid.txt')
+            hrd.write_to_text(reach_goal, moves_path, 'moves')
+            hrd.expand_moves(moves_path, grid_path)
+            with open(grid_path, 'rb') as f:
+                self.assertEqual(f.read(), bytes(hrd.solution_text(reach_goal, 'grid')))
+
+
+class ServeTest(unittest.TestCase):
+
+    def serve(self, requests, *argv):
+        # the answers of hrd.py serve to json lines on stdin, in the order they came
+        lines = ''.join(json.dumps(request) + '\n' for request in requests)
+        result = subprocess.run([sys.executable, hrd_path, 'serve', '--jobs', '2'] + list(argv),
+                                input=lines, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return [json.loads(line) for line in result.stdout.splitlines()]
+
+    def serve_by_id(self, requests, *argv):
+        return {answer['id']: answer for answer in self.serve(requests, *argv)}
+
+    def test_solve(self):
+        board = puzzle_text('03_30_moves.txt')
+        answers = self.serve_by_id([
+            {'id': 1, 'board': board},
+            {'id': 2, 'board': board, 'algo': 'hda'},
+            {'id': 3, 'board': board, 'algo': 'portfolio'},
+            {'id': 4, 'board': board, 'algo': 'bibfs', 'format': 'moves'},
+        ])
+        for i in (1, 2, 4):
+            self.assertEqual((answers[i]['status'], answers[i]['moves']), ('ok', 30))
+        self.assertEqual(answers[3]['status'], 'ok')
+        self.assertEqual(len(answers[4]['solution'].splitlines()), 5 + 1 + 30)
+
+    def test_rejects_bad_requests(self):
+        board = puzzle_text('01_one_move.txt')
+        answers = self.serve_by_id([
+            {'id': 1, 'board': board, 'algo': 'db'},
+            {'id': 2, 'board': board, 'weight': 0.5},
+            {'id': 3, 'board': board, 'algo': 'nope'},
+            {'id': 4, 'board': board, 'timeout': 0},
+            {'id': 5, 'board': board, 'timeout': None},
+            {'id': 6},
+        ])
+        for i in range(1, 7):
+            self.assertTrue(answers[i]['status'].startswith('error'), answers[i])
+
+    def test_timeout_and_cancel_free_the_worker(self):
+        # with one worker, a solve that is cancelled or times out must not hold up the next one
+        classic, one_move = puzzle_text('08_classic.txt'), puzzle_text('01_one_move.txt')
+        answers = self.serve_by_id([
+            {'id': 1, 'board': classic, 'algo': 'idastar', 'timeout': 0.5},
+            {'id': 2, 'board': one_move, 'timeout': 10},
+        ], '--jobs', '1')
+        self.assertEqual(answers[1]['status'], 'timeout')
+        self.assertEqual(answers[2]['status'], 'ok')
+        self.assertLess(answers[2]['seconds'], 2)
+        answers = self.serve([
+            {'id': 1, 'board': classic, 'algo': 'idastar', 'timeout': 60},
+            {'id': 1, 'op': 'cancel'},
+            {'id': 2, 'board': one_move, 'timeout': 10},
+        ], '--jobs', '1')
+        self.assertEqual(sorted(answer['status'] for answer in answers if answer['id'] == 1), ['cancelled'] * 2)
+        second = [answer for answer in answers if answer['id'] == 2][0]
+        self.assertEqual(second['status'], 'ok')
+        self.assertLess(second['seconds'], 2)
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus, outdir = os.path.join(tmp, 'corpus'), os.path.join(tmp, 'out')
+            os.mkdir(corpus)
+            for name in ('02_10_moves.txt', '03_30_moves.txt', '08_classic.txt'):
+                with open(os.path.join(corpus, name), 'w') as f:
+                    f.write(puzzle_text(name))
+            # idastar takes minutes on the classic layout, so only that puzzle runs out of time
+            result = subprocess.run([sys.executable, hrd_path, 'batch', '--inputs', corpus, '--outdir', outdir,
+                                     '--jobs', '2', '--timeout', '1', '--algo', 'idastar'],
+                                    capture_output=True, text=True, timeout=120)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn('puzzles: 3 failed: 1', result.stdout)
+            with open(os.path.join(outdir, 'summary.csv'), newline='') as f:
+                rows = {row['puzzle']: row for row in csv.DictReader(f)}
+            self.assertEqual(rows['08_classic.txt']['status'], 'timeout')
+            self.assertFalse(os.path.exists(os.path.join(outdir, '08_classic_sol.txt')))
+            for name in ('02_10_moves.txt', '03_30_moves.txt'):
+                self.assertEqual((rows[name]['status'], int(rows[name]['moves'])), ('ok', shortest_moves[name]))
+                reach_goal = hrd.solve(read_puzzle(name), solver_args('--algo', 'idastar'))
+                with open(os.path.join(outdir, name.replace('.txt', '_sol.txt')), 'rb') as f:
+                    self.assertEqual(f.read(), bytes(hrd.solution_text(reach_goal)))
+
+
+class BenchTest(unittest.TestCase):
+
+    def test_bench_every_algorithm(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = os.path.join(tmp, 'corpus')
+            os.mkdir(corpus)
+            with open(os.path.join(corpus, '02_10_moves.txt'), 'w') as f:
+                f.write(puzzle_text('02_10_moves.txt'))
+            baseline = os.path.join(tmp, 'baseline.json')
+            command = [sys.executable, hrd_path, 'bench', '--corpus', corpus, '--repeat', '1', '--baseline', baseline,
+                       '--algos', 'astar,dfs,bibfs,idastar,hda,arastar,portfolio', '--frontiers', 'heap,buckets']
+            result = subprocess.run(command + ['--save'], capture_output=True, text=True, timeout=120)
+            self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+            with open(baseline) as f:
+                rows = json.load(f)['results']
+            self.assertEqual(sorted(rows), sorted('02_10_moves.txt/' + algo for algo in (
+                'astar', 'astar:buckets', 'dfs', 'bibfs', 'idastar', 'hda', 'arastar', 'portfolio')))
+            for name, row in rows.items():
+                self.assertEqual(row['status'], 'ok', name)
+                if name.split('/')[1].split(':')[0] in hrd.optimal_algorithms:
+                    self.assertEqual(row['moves'], 10, name)
+            # the heap row keeps its name without --frontiers, so it is compared against the baseline
+            result = subprocess.run(command[:-2] + ['--algos', 'astar', '--threshold', '1000'],
+                                    capture_output=True, text=True, timeout=120)
+            self.assertIn('no regressions', result.stdout)
+
+    def test_regressions(self):
+        old = {'a/astar': {'status': 'ok', 'seconds': 1.0, 'expanded': 100, 'peak_rss_mb': 20.0},
+               'b/astar': {'status': 'ok', 'seconds': 0.001, 'expanded': 100, 'peak_rss_mb': 20.0}}
+        new = {'a/astar': {'status': 'ok', 'seconds': 1.5, 'expanded': 100, 'peak_rss_mb': 20.0},
+               'b/astar': {'status': 'ok', 'seconds': 0.002, 'expanded': 100, 'peak_rss_mb': 20.0}}
+        # b is below bench_min_seconds, too fast to compare on time
+        self.assertEqual(hrd.bench_regressions(new, old, 0.1), [('a/astar', 'seconds', 1.0, 1.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()